@@ -1,8 +1,15 @@
 import sys
+import os
 import pdb
 import re
+import time
+from bisect import bisect_right
+from itertools import compress, count, islice
+from operator import ne
 from typing import Callable
 
+from symbols import readSymbols
+
 jumpOpcodes = ['jne', 'jeq', 'jlo', 'jhs', 'jn', 'jge', 'jl', 'jmp']
 twoOpOpcodes = ['!!!', '!!!', '!!!', '!!!', 'mov', 'add', 'addc', 'subc', 'sub', 'cmp', 'dadd', 'bit', 'bic', 'bis', 'xor', 'and']
 oneOpOpcodes = ['rrc', 'swpb', 'rra', 'sxt', 'push', 'call', 'reti']
@@ -54,6 +61,10 @@ def hexrep(number: int, zeroes = 4):
 	leading0s = zeroes - hexcount
 	return ('0' * leading0s) + hexstr
 
+def swapEndianness(word: int):
+	"""Converts between instruction words and the little-endian words in the output stream."""
+	return ((word & 0xff) << 8) | (word >> 8)
+
 def highlight(string: str, substring: str):
 	"""Highlight a substring in a string"""
 	return string.replace(substring, f"\033[4m{substring}\033[0m") if substring else string
@@ -66,6 +77,7 @@ class AssemblyError(Exception):
 		self.type = "Improperly defined AssemblyError"
 		self.name = name
 		self.reason = reason
+		self.lineNumber = None #Filled in by callers that know which source line failed
 
 class OpcodeError(AssemblyError):
 	"""
@@ -151,6 +163,7 @@ labels = {} #Label name and its PC location
 """
 `labels` are a label name, followed by a the address of the label relative to the loadaddr
 """
+importedLabels = set() #Labels imported from a symbol file, which the source may redefine
 jumps = {} #PC location of jump and its corresponding label
 """
 `jumps` are the address of a jump instruction and its corresponding label
@@ -159,13 +172,18 @@ Example jump:
 {0: "loop"}
 """
 output = [] #Output hex
+jumpRange = 0x200 #Furthest a jump can reach from its own PC, in words: -0x1ff through +0x200
 
-def asmMain(assembly: str|None, outfile=None, silent=False):
+def asmMain(assembly: str|None, outfile=None, silent=False, symbols=None, loadaddr=0, listing=None):
 	lineNumber = 0
+	listingLines = [] #PC, word count and source text of each line, recorded for the listing as it's assembled
 	global PC #Get PC
 
 	outFP = open(outfile, 'w') if outfile else None
 
+	if symbols:
+		importLabels(readSymbols(symbols), loadaddr)
+
 	if not assembly:
 		#Provide a prompt for entry
 		instructions = ''
@@ -181,10 +199,8 @@ def asmMain(assembly: str|None, outfile=None, silent=False):
 			instructions = fp.read()
 
 
-	for ins in instructions.splitlines():
-		#Strip leading and trailing whitespace
-		ins = ins.strip()
-		ins = re.split(r'\s*[/;]', ins)[0] #Remove comments
+	for source in instructions.splitlines():
+		ins = stripLine(source)
 		#Skip empty lines or lines beginning with a comment
 		if len(ins) == 0:
 			continue
@@ -203,11 +219,12 @@ def asmMain(assembly: str|None, outfile=None, silent=False):
 			ins = hook(ins)
 
 		#Handle label registration
+		startPC = PC
 		if ':' in ins:
 			try:
 				registerLabel(ins)
 			except RedefinedLabelError as exp:
-				print('Label "' + exp.label + '" at line number ' + str(lineNumber + 1) + ' already defined')
+				print('Label "' + exp.name + '" at line number ' + str(lineNumber + 1) + ' already defined')
 				sys.exit(-1)
 		else:
 			try:
@@ -217,6 +234,7 @@ def asmMain(assembly: str|None, outfile=None, silent=False):
 				print(f'{exp.type} found on line {lineNumber + 1}: "{ins}"\n{exp.reason}')
 				sys.exit(-1)
 
+		listingLines.append((startPC, PC - startPC, source.strip()))
 		lineNumber += 1
 
 	#Handle postprocessor hooks.
@@ -225,14 +243,42 @@ def asmMain(assembly: str|None, outfile=None, silent=False):
 		postprocessorHook()
 
 	#Output the object as hex
-	for i in output:
+	printOutput(output, outFP, silent)
+	if outFP:
+		outFP.close()
+
+	if listing:
+		sourceLabels = {label: pc for label, pc in labels.items() if label not in importedLabels}
+		writeListing(listing, listingLines, output, sourceLabels, loadaddr)
+
+def writeListing(filename: str, lines: list, words: list, labels: dict, loadaddr=0):
+	"""
+	Writes a listing of each source line with its address and the words it assembled to, followed by the symbol table.
+	`lines` are (PC, word count, source text), and `labels` are label names and their PC.
+	Since `words` are read after jumps are resolved, jumps are listed with their final offsets.
+	"""
+	with open(filename, 'w') as fp:
+		for pc, count, source in lines:
+			encoded = ' '.join(hexrep(word) for word in words[pc : pc + count])
+			print(f'{hexrep(loadaddr + pc * 2)}: {encoded:<14} {source}', file=fp)
+		#The symbol table is in the same format as symbol files, so a listing can be passed as one
+		print('\nSymbols:', file=fp)
+		for label, pc in sorted(labels.items(), key=lambda label: (label[1], label[0])):
+			print(f'{hexrep(loadaddr + pc * 2)} {label}', file=fp)
+
+def printOutput(words: list, outFP=None, silent=False):
+	"""Prints an assembled object as hex to stdout and/or an open output file."""
+	for i in words:
 		if not silent:
 			print(hexrep(i), end='', file=sys.stdout)# + ' (' + bitrep(i, 16) + ')')
 		if outFP:
 			print(hexrep(i), end='', file=outFP)
 	print('') #End hex representation with a newline
-	if outFP:
-		outFP.close()
+
+def stripLine(ins: str) -> str:
+	"""Strips leading and trailing whitespace and comments from a source line."""
+	ins = ins.strip()
+	return re.split(r'\s*[/;]', ins)[0] #Remove comments
 
 def registerPreprocessorHook(hook: Callable[[str], str]):
 	if hook not in preprocessorHooks:
@@ -252,17 +298,23 @@ def resolveJumps():
 		except KeyError:
 			print(f'Label "{label}" does not exist, but a jump instruction attempts to jump to it')
 			sys.exit(-1)
-		#Modify the jump instruction
-		#Get in little-endian format
-		ins = hexrep(output[pc])
-		ins = int(ins[2:4] + ins[0:2], 16)
-		ins = [bit for bit in bitrep(ins, 16)]
-		offset = (labelpos - pc) * 2 #Words versus bytes
-		#Jump offsets are multiplied by two, added by two (PC increment), and sign extendedB
-		ins[6:] = bitrep((offset - 2) // 2, 10)
-		#Output again in little endian
-		strword = hexrep(int(''.join(str(e) for e in ins), 2), 4)
-		output[pc] = int(strword[2:] + strword[0:2], 16)
+		if not -jumpRange < labelpos - pc <= jumpRange:
+			print(f'Label "{label}" is out of range of a jump instruction. Range is -3fe bytes through +400 bytes.')
+			sys.exit(-1)
+		output[pc] = patchJump(output[pc], pc, labelpos)
+
+def patchJump(word: int, pc: int, labelpos: int) -> int:
+	"""Returns the (little-endian) jump instruction `word` at `pc`, modified to jump to `labelpos`."""
+	#Get in little-endian format
+	ins = hexrep(word)
+	ins = int(ins[2:4] + ins[0:2], 16)
+	ins = [bit for bit in bitrep(ins, 16)]
+	offset = (labelpos - pc) * 2 #Words versus bytes
+	#Jump offsets are multiplied by two, added by two (PC increment), and sign extendedB
+	ins[6:] = bitrep((offset - 2) // 2, 10)
+	#Output again in little endian
+	strword = hexrep(int(''.join(str(e) for e in ins), 2), 4)
+	return int(strword[2:] + strword[0:2], 16)
 
 #TODO: Resolve labels in calls
 
@@ -271,10 +323,19 @@ def registerLabel(ins: str):
 	global labels #Get labels
 	global PC #Get PC
 	label, addr = ins.split(sep=':')
-	if label in labels:
+	if label in labels and label not in importedLabels:
 		raise RedefinedLabelError(label)
+	importedLabels.discard(label)
 	labels[label] = int(addr) if addr != '' else PC
 
+def importLabels(symbols: dict, loadaddr=0):
+	"""Predefines labels from a dict of {name: address}, such as one read with `readSymbols`.
+	Addresses are absolute, so they are made relative to `loadaddr`. Labels defined in the source take precedence."""
+	global labels #Get labels
+	for label, address in symbols.items():
+		labels[label] = (address - loadaddr) // 2
+		importedLabels.add(label)
+
 # -- Defines --
 def resolveDefines(ins: str) -> str:
 	global _defines
@@ -323,12 +384,14 @@ def assemble(ins: str):
 def assembleEmulatedInstruction(ins: str) -> None:
 	"""Assembles a zero- or one-operand 'emulated' instruction."""
 	#Emulated instructions are either zero or one operand instructions.
-	opcode, notUsed = getOpcode(ins)
+	opcode, byteMode = getOpcode(ins)
 	if '{reg}' in emulatedOpcodes[opcode]:
 		register = ins[ins.find(' ') + 1 : ]
 		ins = emulatedOpcodes[opcode].format(reg=register)
 	else:
 		ins = emulatedOpcodes[opcode]
+	if byteMode: #Carry byte mode over to the real instruction
+		ins = ins.replace(' ', '.b ', 1)
 	return assemble(ins)
 
 def assembleOneOpInstruction(ins: str):
@@ -406,11 +469,13 @@ def assembleJumpInstruction(ins: str):
 	#Immediate offset
 	char1 = dest[0]
 	#Is this a number?
-	if re.match(r'[+\-]?[0x|0b]?[0-9A-Fa-f]+', dest):
+	#Offsets start with a sign or a digit (including a 0x prefix), so labels made of hex letters (like 'add' or 'cafe')
+	#aren't mistaken for them
+	if re.fullmatch(r'[+\-]?0[xX][0-9A-Fa-f]+|[+\-][0-9A-Fa-f]+|[0-9][0-9A-Fa-f]*', dest):
 		offset = int(dest, 16)
 		if offset % 2 != 0:
 			raise JumpOffsetError(dest, "Jump offset cannot be odd.")
-		if offset <= -0x3fe or offset >= 0x400:
+		if offset < -0x3fe or offset > 0x400:
 			raise JumpOffsetError(dest, "Jump offset out of range. Range is -3fe bytes through +400 bytes.")
 		#Jump offsets are multiplied by two, added by two (PC increment), and sign extended
 		out[6:] = bitrep((offset - 2) // 2, 10)
@@ -521,3 +586,367 @@ def assembleRegister(reg: str, opcode=None, isDestReg = False):
 		regID = getRegister(reg)
 
 	return extensionWord, adrmode, regID
+
+
+# -- Incremental assembly --
+
+def encodeInstruction(ins: str) -> tuple:
+	"""
+	Assembles a single (preprocessed) instruction in isolation, returning the words it encodes to and
+	the label it jumps to, if any. The global output stream, PC and jump table are left untouched.
+	Jumps to labels are returned unresolved, to be fixed up later with `patchJump`.
+	"""
+	global PC, output, jumps
+	savedState = (PC, output, jumps)
+	PC, output, jumps = 0, [], {}
+	try:
+		assemble(ins)
+		return output, jumps.get(0)
+	finally:
+		PC, output, jumps = savedState
+
+class SourceLine:
+	"""A single line of source held by an `AssemblySession`, along with its encoding."""
+	__slots__ = ('text', 'kind', 'block', 'position', 'offset', 'words', 'label', 'labelAddr', 'define', 'jumpLabel',
+		'jumpOffset')
+
+	def __init__(self, text: str) -> None:
+		self.text = text #Raw source text, as written
+		self.kind = 'empty' #One of 'empty', 'directive', 'define', 'end', 'ignored', 'label' or 'ins'
+		self.block = None #SourceBlock holding the line
+		self.position = 0 #Index of the line within its block
+		self.offset = 0 #Words before the line within its block
+		self.words = []
+		self.label = None
+		self.labelAddr = None #Explicit address given with label:addr
+		self.define = None #Identifier and replacement text of a .define directive
+		self.jumpLabel = None #Label jumped to, if this is a jump to a label
+		self.jumpOffset = None #Offset the jump word is currently patched with
+
+class SourceBlock:
+	"""
+	A run of consecutive lines held by an `AssemblySession`. Lines only know their position and offset within
+	their block, and blocks are replaced whole when edited, so an edit leaves every other block as it was.
+	"""
+	__slots__ = ('lines', 'words', 'firstLine', 'pc')
+
+	def __init__(self, lines: list) -> None:
+		self.lines = lines
+		self.words = 0
+		for position, line in enumerate(lines):
+			line.block, line.position, line.offset = self, position, self.words
+			self.words += len(line.words)
+		self.firstLine = self.pc = 0 #Filled in by AssemblySession._locateBlocks
+
+blockSize = 256 #Most lines in a SourceBlock
+
+class AssemblySession:
+	"""
+	An `AssemblySession` assembles a source file and keeps the encoding of each line along with the label table,
+	so that the source can be edited and reassembled incrementally. Only the edited lines are re-encoded, and only
+	the jumps an edit can affect are resolved again: jumps to labels it (re)defines, jumps to labels at fixed
+	addresses, and, if it changed size, jumps close enough to reach across it.
+
+	Lines are held in `SourceBlock`s, which know their own PC, so an edit costs time in proportion to its size plus
+	the number of blocks, rather than to the size of the file. `update` first has to find the edit by comparing the
+	old and new source, which is linear in the file size but done in C; `replaceLines` takes the edit directly.
+
+	Unlike `asmMain`, errors are raised as `AssemblyError`s (with `lineNumber` set) rather than exiting.
+	```py
+	session = AssemblySession(source)
+	session.update(editedSource)
+	session.output #Assembled words, in the same format as `output`
+	```
+	Editing a `.define` or `.end` directive affects every later line, so it causes a full reassembly.
+	Labels can be predefined from a dict of {name: absolute address} with `symbols`, as with `importLabels`.
+	"""
+	def __init__(self, source: str = '', symbols: dict = None, loadaddr: int = 0) -> None:
+		self.blocks = []
+		self.text = [] #Raw text of each line
+		self.output = []
+		self.labels = {} #Label name and its defining SourceLine
+		self.imported = {} #Imported label name and a SourceLine standing in for its definition
+		for label, address in (symbols or {}).items():
+			self.imported[label] = SourceLine('')
+			self.imported[label].kind = 'label'
+			self.imported[label].label = label
+			self.imported[label].labelAddr = (address - loadaddr) // 2
+		self.defines = [] #SourceLines of .define directives, in source order
+		self.endLine = None #SourceLine of the first .end directive
+		self._jumpsTo = {} #Label name and the jump SourceLines jumping to it
+		self._fixedJumps = set() #Jump SourceLines whose label has a fixed address, so any edit before them moves them
+		self._unresolved = set() #Jump SourceLines that failed to resolve, retried on every edit
+		self._encodings = {} #Preprocessed instruction and its (words, jump label)
+		self._blocksMoved = False #Whether blocks' first lines and PCs need working out again
+		if source:
+			self.update(source)
+
+	def lineIndex(self, line: SourceLine) -> int:
+		"""Returns the index of a line in the source."""
+		self._locateBlocks()
+		return line.block.firstLine + line.position
+
+	def pcOf(self, line: SourceLine) -> int:
+		"""Returns the PC at the start of a line."""
+		self._locateBlocks()
+		return line.block.pc + line.offset
+
+	def writeListing(self, filename: str, loadaddr=0):
+		"""Writes a listing of the session's current state, as `writeListing` does for `asmMain`."""
+		lines = [(self.pcOf(line), len(line.words), line.text.strip())
+			for block in self.blocks for line in block.lines if line.kind in ('label', 'ins')]
+		labels = {label: line.labelAddr if line.labelAddr is not None else self.pcOf(line) for label, line in self.labels.items()}
+		writeListing(filename, lines, self.output, labels, loadaddr)
+
+	def update(self, source: str):
+		"""Reassembles after the source has been edited, re-encoding only the lines that changed."""
+		newText = source.splitlines()
+		oldText = self.text
+		#Find the edited region by trimming unchanged lines from both ends
+		limit = min(len(oldText), len(newText))
+		start = next(compress(count(), map(ne, oldText, newText)), limit)
+		trailing = islice(map(ne, reversed(oldText), reversed(newText)), limit - start)
+		end = next(compress(count(), trailing), limit - start)
+		self.replaceLines(start, len(oldText) - end, newText[start : len(newText) - end])
+
+	def replaceLines(self, start: int, end: int, newText: list):
+		"""Replaces source lines `start` up to (but not including) `end` with `newText`, and reassembles."""
+		if any(isStructural(text) for text in self.text[start:end]) or any(isStructural(text) for text in newText):
+			text = self.text[:start] + newText + self.text[end:]
+			jumps = self._rebuild(text)
+		else:
+			jumps = self._splice(start, end, newText)
+		self._resolveJumps(jumps)
+
+	def _locateBlocks(self):
+		"""Works out the first line and PC of every block, if an edit has moved them."""
+		if not self._blocksMoved:
+			return
+		firstLine = pc = 0
+		for block in self.blocks:
+			block.firstLine, block.pc = firstLine, pc
+			firstLine += len(block.lines)
+			pc += block.words
+		self._blocksMoved = False
+
+	def _rebuild(self, text: list) -> set:
+		"""Throws away all state and assembles `text` from scratch, returning the jumps to resolve."""
+		oldState = self.__dict__.copy() #Every container is replaced rather than cleared, so this restores them
+		self.blocks, self.text, self.output, self.labels = [], [], [], {}
+		self.defines, self.endLine = [], None
+		self._jumpsTo, self._fixedJumps, self._unresolved = {}, set(), set()
+		try:
+			jumps = self._splice(0, 0, text)
+		except AssemblyError:
+			self.__dict__.update(oldState)
+			raise
+		lines = [line for block in self.blocks for line in block.lines]
+		self.defines = [line for line in lines if line.kind == 'define']
+		self.endLine = next((line for line in lines if line.kind == 'end'), None)
+		return jumps
+
+	def _splice(self, start: int, end: int, newText: list) -> set:
+		"""
+		Encodes `newText`, and swaps it in for lines `start` up to `end`, replacing the blocks they fall in.
+		Returns the jumps that need resolving again.
+		"""
+		self._locateBlocks()
+		if self.blocks:
+			first = max(bisect_right(self.blocks, start, key=lambda block: block.firstLine) - 1, 0)
+			last = max(bisect_right(self.blocks, end - 1, key=lambda block: block.firstLine) - 1, first)
+			spanned = [line for block in self.blocks[first : last + 1] for line in block.lines]
+			startOffset = start - self.blocks[first].firstLine
+			head, removed, tail = spanned[:startOffset], spanned[startOffset : end - start + startOffset], spanned[end - start + startOffset :]
+			pcStart = self.blocks[first].pc + sum(len(line.words) for line in head)
+		else:
+			first, last = 0, -1
+			head, removed, tail = [], [], []
+			pcStart = 0
+
+		#Encode everything first, so that an error leaves the session untouched
+		defines = {}
+		for line in self.defines:
+			if self.lineIndex(line) < start:
+				defines[line.define[0]] = line.define[1]
+		ignored = self.endLine is not None and self.lineIndex(self.endLine) < start
+		newLines = self._encodeLines(newText, start, defines, ignored)
+
+		removedLabels = {line.label for line in removed if line.kind == 'label'}
+		newLabels = set()
+		for offset, line in enumerate(newLines):
+			if line.kind != 'label':
+				continue
+			if line.label in newLabels or (line.label in self.labels and line.label not in removedLabels):
+				exp = RedefinedLabelError(line.label)
+				exp.lineNumber = start + offset + 1
+				raise exp
+			newLabels.add(line.label)
+
+		jumps = set(self._unresolved)
+		for line in removed:
+			if line.kind == 'label':
+				del self.labels[line.label]
+			elif line.jumpLabel is not None:
+				self._jumpsTo[line.jumpLabel].discard(line)
+				self._fixedJumps.discard(line)
+				self._unresolved.discard(line)
+				jumps.discard(line)
+		for line in newLines:
+			if line.kind == 'label':
+				self.labels[line.label] = line
+			elif line.jumpLabel is not None:
+				self._jumpsTo.setdefault(line.jumpLabel, set()).add(line)
+				jumps.add(line)
+		for label in removedLabels | newLabels:
+			jumps.update(self._jumpsTo.get(label, ()))
+
+		#Swap in new blocks, evenly sized, folding in the next block if they'd be small so blocks don't fragment
+		lines = head + newLines + tail
+		if len(lines) < blockSize // 2 and last + 1 < len(self.blocks):
+			last += 1
+			lines += self.blocks[last].lines
+		blockCount = -(-len(lines) // blockSize)
+		size = -(-len(lines) // blockCount) if blockCount else 0
+		newBlocks = [SourceBlock(lines[i : i + size]) for i in range(0, len(lines), size or 1)]
+		self.blocks[first : last + 1] = newBlocks
+		self._blocksMoved = True
+
+		newWords = [word for line in newLines for word in line.words]
+		pcOldEnd = pcStart + sum(len(line.words) for line in removed)
+		self.output[pcStart:pcOldEnd] = newWords
+		self.text[start:end] = newText
+
+		if len(newWords) != pcOldEnd - pcStart:
+			#Everything after the edit moved, so jumps across it changed, as did jumps to fixed addresses after it
+			jumps.update(self._fixedJumps)
+			jumps.update(self._jumpsNear(first, first + len(newBlocks) - 1, pcStart, pcStart + len(newWords)))
+		return jumps
+
+	def _jumpsNear(self, first: int, last: int, pcLow: int, pcHigh: int) -> list:
+		"""
+		Returns the jumps in blocks `first` through `last`, and in any blocks within jump range of PCs `pcLow`
+		up to `pcHigh`. Every resolved jump is in range of its label, so these are all the jumps that can reach
+		across an edit of those PCs.
+		"""
+		self._locateBlocks()
+		while first > 0 and self.blocks[first - 1].pc + self.blocks[first - 1].words + jumpRange >= pcLow:
+			first -= 1
+		while last + 1 < len(self.blocks) and self.blocks[last + 1].pc <= pcHigh + jumpRange:
+			last += 1
+		return [line for block in self.blocks[first : last + 1] for line in block.lines if line.jumpLabel is not None]
+
+	def _encodeLines(self, texts: list, firstIndex: int, defines: dict, ignored: bool) -> list:
+		"""
+		Classifies and encodes source lines, starting at line `firstIndex`, reusing earlier encodings of the same
+		instruction. `defines` are those in effect before the first line, and as in `asmMain`, a .define applies
+		from the line after it. Lines are ignored after an .end directive, or from the start if `ignored` is set.
+		"""
+		defines = dict(defines)
+		lines = []
+		for offset, text in enumerate(texts):
+			line = SourceLine(text)
+			ins = stripLine(text)
+			define = re.match(r'.define\s*(\w+)[\s:=]+(.*)\s*', ins) if ins.startswith('.define') else None
+			if ignored:
+				line.kind = 'ignored'
+			elif len(ins) == 0:
+				line.kind = 'empty'
+			elif define:
+				line.kind = 'define'
+				line.define = define.groups()
+				defines[line.define[0]] = line.define[1]
+			elif ins.startswith('.end'):
+				line.kind = 'end'
+				ignored = True
+			elif ins.startswith('.'):
+				line.kind = 'directive'
+			else:
+				#Defines are applied by the session itself, in place of the global resolveDefines hook
+				for name, replacement in defines.items():
+					ins = ins.replace(name, replacement)
+				for hook in preprocessorHooks:
+					if hook is not resolveDefines:
+						ins = hook(ins)
+				if ':' in ins:
+					line.kind = 'label'
+					line.label, addr = ins.split(sep=':')
+					line.labelAddr = int(addr) if addr != '' else None
+				else:
+					line.kind = 'ins'
+					if ins not in self._encodings:
+						try:
+							self._encodings[ins] = encodeInstruction(ins)
+						except AssemblyError as exp:
+							exp.lineNumber = firstIndex + offset + 1
+							raise
+					line.words, line.jumpLabel = self._encodings[ins]
+			lines.append(line)
+		return lines
+
+	def _resolveJumps(self, jumps: set):
+		"""Resolves jumps, patching those whose offset to their label has changed since they were last resolved."""
+		failed = []
+		for line in jumps:
+			self._fixedJumps.discard(line)
+			self._unresolved.discard(line)
+			target = self.labels.get(line.jumpLabel) or self.imported.get(line.jumpLabel)
+			if target is None:
+				failed.append((line, UndefinedLabelError(line.jumpLabel,
+					f'Label "{line.jumpLabel}" does not exist, but a jump instruction attempts to jump to it')))
+				continue
+			if target.labelAddr is not None:
+				self._fixedJumps.add(line)
+				labelpos = target.labelAddr
+			else:
+				labelpos = self.pcOf(target)
+			pc = self.pcOf(line)
+			if not -jumpRange < labelpos - pc <= jumpRange:
+				failed.append((line, JumpOffsetError(line.jumpLabel,
+					'Jump offset out of range. Range is -3fe bytes through +400 bytes.')))
+				continue
+			if labelpos - pc != line.jumpOffset:
+				self.output[pc] = patchJump(line.words[0], pc, labelpos)
+				line.jumpOffset = labelpos - pc
+		for line, exp in failed:
+			line.jumpOffset = None
+			self._unresolved.add(line)
+		if failed:
+			line, exp = min(failed, key=lambda failure: self.lineIndex(failure[0]))
+			exp.lineNumber = self.lineIndex(line) + 1
+			raise exp
+
+def isStructural(line: str) -> bool:
+	"""Whether a source line is a directive that affects the assembly of every later line."""
+	ins = stripLine(line)
+	return ins.startswith('.define') or ins.startswith('.end')
+
+def asmWatch(assembly: str, outfile=None, silent=False, interval=0.5, symbols=None, loadaddr=0, listing=None):
+	"""Assembles a source file, then reassembles it incrementally every time the file is modified."""
+	session = AssemblySession(symbols=readSymbols(symbols) if symbols else None, loadaddr=loadaddr)
+	lastModified = None
+	print(f'Watching "{assembly}" for changes. Press Ctrl+C to stop.')
+	while True:
+		try:
+			modified = os.stat(assembly).st_mtime_ns
+			if modified != lastModified:
+				with open(assembly) as fp:
+					source = fp.read()
+		except FileNotFoundError: #Editors that save by renaming a new file over the old one can briefly leave none
+			modified = lastModified #Try again next time round
+		if modified != lastModified:
+			lastModified = modified
+			try:
+				session.update(source)
+			except AssemblyError as exp:
+				ins = highlight(source.splitlines()[exp.lineNumber - 1].strip(), exp.name)
+				print(f'{exp.type} found on line {exp.lineNumber}: "{ins}"\n{exp.reason}')
+			except ValueError as exp: #Malformed numbers are not AssemblyErrors; don't stop watching over them
+				print(f'Assembly failed: {exp}')
+			else:
+				outFP = open(outfile, 'w') if outfile else None
+				printOutput(session.output, outFP, silent)
+				if outFP:
+					outFP.close()
+				if listing:
+					session.writeListing(listing, loadaddr)
+		time.sleep(interval)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+#Instruction-level diffing of two code objects.
+#Both images are decoded once and split into basic blocks. Each block is hashed with the addresses in it masked out
+#(jump offsets, &absolute and pc relative operands, and call and br targets), so inserting an instruction doesn't make
+#every later block look different, while a patched immediate or index still does. The two sequences of block hashes
+#are then aligned with a patience diff, which is near-linear on real images.
+
+import sys
+
+import msprobe
+
+class Block:
+	"""A basic block: a run of instructions with a single entry and exit."""
+	__slots__ = ('start', 'end', 'starts', 'key')
+
+	def __init__(self, starts: list) -> None:
+		self.starts = starts #Word index of each instruction in the block
+		self.start = starts[0]
+		self.end = None #Word index just past the last instruction
+		self.key = None #Hash of the normalized instructions
+
+def endsBlock(instruction):
+	"""Whether an instruction transfers control, and so ends a basic block."""
+	if instruction & 0xe000 == 0x2000: #Jump
+		return True
+	if instruction & 0xff80 == 0x1300: #reti
+		return True
+	#Two-op instructions writing to pc (br, ret...). cmp and bit don't write their destination.
+	return instruction >= 0x4000 and instruction & 0x008f == 0 and (instruction >> 12) not in (9, 11)
+
+def normalize(words, index):
+	"""
+	Returns the words of the instruction at `index` with its addresses masked out (as None): the jump offset,
+	&absolute and pc relative operands, and the immediate target of call or br. Other immediates and indices are kept.
+	"""
+	instruction = words[index]
+	if instruction & 0xe000 == 0x2000: #Jump
+		return (instruction & 0xfc00,)
+	if instruction & 0xfc00 == 0x1000: #One operand
+		operands = [(instruction & 0xf, (instruction >> 4) & 3, instruction & 0xff80 == 0x1280)] #call
+	else:
+		operands = [((instruction >> 8) & 0xf, (instruction >> 4) & 3, instruction & 0xf0cf == 0x4000), #br
+			(instruction & 0xf, (instruction >> 7) & 1, False)]
+	normalized = [instruction]
+	extension = index + 1
+	for reg, adrmode, branches in operands:
+		if not msprobe.usesExtensionWord(reg, adrmode):
+			continue
+		isAddress = (adrmode == 1 and reg in (0, 2)) or (adrmode == 3 and branches)
+		if isAddress or extension >= len(words): #Truncated at the end of the image
+			normalized.append(None)
+		else:
+			normalized.append(words[extension])
+		extension += 1
+	return tuple(normalized)
+
+def splitBlocks(words):
+	"""Decodes a list of words into basic blocks, split after control transfers and before jump targets."""
+	starts = []
+	index = 0
+	while index < len(words):
+		starts.append(index)
+		index += msprobe.instructionLength(words[index])
+
+	#Jump targets are leaders, if they land on an instruction boundary
+	leaders = {msprobe.jumpTarget(index, words[index]) for index in starts if words[index] & 0xe000 == 0x2000}
+
+	blocks = []
+	current = []
+	for index in starts:
+		if current and index in leaders:
+			blocks.append(Block(current))
+			current = []
+		current.append(index)
+		if endsBlock(words[index]):
+			blocks.append(Block(current))
+			current = []
+	if current:
+		blocks.append(Block(current))
+
+	for block, following in zip(blocks, blocks[1:] + [None]):
+		block.end = following.start if following else len(words)
+		block.key = hash(tuple(normalize(words, index) for index in block.starts))
+	return blocks
+
+def patienceMatch(a, b):
+	"""
+	Aligns two sequences of hashes with a patience diff, returning the matched index pairs in order.
+	Hashes unique to both sides anchor the alignment, and the stretches between anchors are aligned in turn.
+	"""
+	matches = []
+	ranges = [(0, len(a), 0, len(b))]
+	while ranges:
+		aLo, aHi, bLo, bHi = ranges.pop()
+		#Common heads and tails match trivially
+		while aLo < aHi and bLo < bHi and a[aLo] == b[bLo]:
+			matches.append((aLo, bLo))
+			aLo += 1
+			bLo += 1
+		while aLo < aHi and bLo < bHi and a[aHi - 1] == b[bHi - 1]:
+			aHi -= 1
+			bHi -= 1
+			matches.append((aHi, bHi))
+		if aLo == aHi or bLo == bHi:
+			continue
+
+		countsA = {}
+		for index in range(aLo, aHi):
+			countsA[a[index]] = countsA.get(a[index], 0) + 1
+		uniqueB = {}
+		for index in range(bLo, bHi):
+			uniqueB[b[index]] = None if b[index] in uniqueB else index
+		anchors = [(index, uniqueB[a[index]]) for index in range(aLo, aHi)
+			if countsA[a[index]] == 1 and uniqueB.get(a[index]) is not None]
+		if not anchors:
+			continue
+
+		#Longest increasing subsequence of the anchors' b indices, by patience sorting
+		piles = [] #Last b index of the best run of each length
+		pileTops = []
+		back = {}
+		for anchor in anchors:
+			low, high = 0, len(piles)
+			while low < high:
+				mid = (low + high) // 2
+				if piles[mid] < anchor[1]:
+					low = mid + 1
+				else:
+					high = mid
+			back[anchor] = pileTops[low - 1] if low else None
+			if low == len(piles):
+				piles.append(anchor[1])
+				pileTops.append(anchor)
+			else:
+				piles[low] = anchor[1]
+				pileTops[low] = anchor
+		chain = []
+		anchor = pileTops[-1]
+		while anchor:
+			chain.append(anchor)
+			anchor = back[anchor]
+		chain.reverse()
+
+		#Align the stretches between anchors
+		previous = (aLo - 1, bLo - 1)
+		for anchor in chain + [(aHi, bHi)]:
+			if anchor[0] - previous[0] > 1 and anchor[1] - previous[1] > 1:
+				ranges.append((previous[0] + 1, anchor[0], previous[1] + 1, anchor[1]))
+			if anchor[0] < aHi:
+				matches.append(anchor)
+			previous = anchor
+	matches.sort()
+	return matches
+
+def diffBlocks(blocksA, blocksB):
+	"""
+	Aligns two lists of blocks, returning a list of (status, blockA, blockB).
+	Status is one of 'unchanged', 'changed', 'removed' (blockB is None) or 'added' (blockA is None).
+	Unmatched blocks between two matches are paired up as changed, and any left over are added or removed.
+	"""
+	matches = patienceMatch([block.key for block in blocksA], [block.key for block in blocksB])
+	result = []
+	indexA = indexB = 0
+	for matchA, matchB in matches + [(len(blocksA), len(blocksB))]:
+		gapA = blocksA[indexA:matchA]
+		gapB = blocksB[indexB:matchB]
+		for blockA, blockB in zip(gapA, gapB):
+			result.append(('changed', blockA, blockB))
+		result.extend(('removed', blockA, None) for blockA in gapA[len(gapB):])
+		result.extend(('added', None, blockB) for blockB in gapB[len(gapA):])
+		if matchA < len(blocksA):
+			result.append(('unchanged', blocksA[matchA], blocksB[matchB]))
+		indexA, indexB = matchA + 1, matchB + 1
+	return result
+
+def blockListing(words, block, pcBase, prefix):
+	"""Disassembles the instructions of a block, one line each."""
+	lines = []
+	for index in block.starts:
+		try:
+			disasm = msprobe.disassembleAt(words, index)[0]
+		except IndexError: #Truncated at the end of the image
+			disasm = '(truncated)'
+		lines.append(f'\t{prefix} {msprobe.hexrep(pcBase + index * 2)}: {disasm}')
+	return lines
+
+def diffMain(fileA, fileB, pcBase=0, microcorruptionparse=False, outfile=None, silent=False):
+	"""Diffs two code objects and outputs the changed, added and removed blocks."""
+	pcBaseA, wordsA = msprobe.readImage(fileA, pcBase, microcorruptionparse)
+	pcBaseB, wordsB = msprobe.readImage(fileB, pcBase, microcorruptionparse)
+	result = diffBlocks(splitBlocks(wordsA), splitBlocks(wordsB))
+
+	outFP = open(outfile, 'w') if outfile else None
+	def report(line):
+		if outFP:
+			print(line, file=outFP)
+		if not silent:
+			print(line, file=sys.stdout)
+
+	def span(pcBase, block):
+		return msprobe.hexrep(pcBase + block.start * 2) + '-' + msprobe.hexrep(pcBase + block.end * 2)
+
+	counts = {'unchanged': 0, 'changed': 0, 'added': 0, 'removed': 0}
+	for status, blockA, blockB in result:
+		counts[status] += 1
+		if status == 'changed':
+			report(f'changed {span(pcBaseA, blockA)} -> {span(pcBaseB, blockB)}')
+			lines = blockListing(wordsA, blockA, pcBaseA, '-') + blockListing(wordsB, blockB, pcBaseB, '+')
+		elif status == 'removed':
+			report(f'removed {span(pcBaseA, blockA)}')
+			lines = blockListing(wordsA, blockA, pcBaseA, '-')
+		elif status == 'added':
+			report(f'added {span(pcBaseB, blockB)}')
+			lines = blockListing(wordsB, blockB, pcBaseB, '+')
+		else:
+			continue
+		for line in lines:
+			report(line)
+	report(', '.join(f'{count} {status}' for status, count in counts.items()) + ' blocks')
+
+	if outFP:
+		outFP.close()
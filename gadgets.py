@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+#ROP gadget finder.
+#Every word offset of an image is decoded at most once. Starting from each terminator (ret, br or call), the finder
+#walks backwards through the offsets whose instruction ends exactly where the next one begins, listing every
+#instruction sequence of up to `depth` instructions that runs into the terminator.
+
+import re
+import sys
+
+import msprobe
+
+terminatorKinds = ['ret', 'br', 'call']
+
+def terminatorKind(instruction):
+	"""Returns which kind of terminator an instruction is, or None."""
+	if instruction == 0x4130: #mov @sp+, pc
+		return 'ret'
+	if instruction & 0xf0cf == 0x4000: #mov src, pc (in word mode)
+		return 'br'
+	if instruction & 0xffc0 == 0x1280:
+		return 'call'
+	return None
+
+def transfersControl(instruction):
+	"""Whether an instruction could transfer control, and so can't appear in the body of a gadget."""
+	if instruction & 0xe000 == 0x2000 or instruction & 0xff80 in (0x1280, 0x1300): #Jumps, call and reti
+		return True
+	#Two-op instructions writing to pc. cmp and bit don't write their destination.
+	return instruction >= 0x4000 and instruction & 0x008f == 0 and (instruction >> 12) not in (9, 11)
+
+class OffsetDecoder:
+	"""Decodes an image from every word offset, each at most once."""
+	def __init__(self, words: list) -> None:
+		self.words = words
+		self.lengths = [msprobe.instructionLength(word) for word in words]
+		self.texts = {} #Word index and its disassembly, filled in as needed
+
+	def usable(self, index):
+		"""Whether the instruction at `index` is valid and fits in the image."""
+		return msprobe.isValidInstruction(self.words[index]) and index + self.lengths[index] <= len(self.words)
+
+	def text(self, index):
+		if index not in self.texts:
+			self.texts[index] = msprobe.disassembleAt(self.words, index)[0]
+		return self.texts[index]
+
+	def predecessors(self, index):
+		"""Offsets whose instruction is valid, doesn't transfer control, and ends right at `index`."""
+		return [previous for previous in range(max(index - 3, 0), index)
+			if self.lengths[previous] == index - previous and self.usable(previous)
+			and not transfersControl(self.words[previous])]
+
+def findGadgets(words, depth=4, kinds=terminatorKinds):
+	"""
+	Finds every gadget of up to `depth` instructions before a terminator of one of `kinds`.
+	Gadgets are deduplicated by their disassembly, returning a dict of {disassembly tuple: [word indexes]}.
+	"""
+	decoder = OffsetDecoder(words)
+	gadgets = {}
+	for index, word in enumerate(words):
+		if terminatorKind(word) not in kinds or not decoder.usable(index):
+			continue
+		frontier = [(index,)]
+		for level in range(depth + 1):
+			nextFrontier = []
+			for chain in frontier:
+				key = tuple(decoder.text(offset) for offset in chain)
+				gadgets.setdefault(key, []).append(chain[0])
+				if level < depth:
+					nextFrontier.extend((previous,) + chain for previous in decoder.predecessors(chain[0]))
+			frontier = nextFrontier
+	return gadgets
+
+def gadgetsMain(image, pcBase=0, microcorruptionparse=False, depth=4, kinds=None, pattern=None, outfile=None, silent=False):
+	"""Finds gadgets in a code object and outputs them, ordered by address."""
+	pcBase, words = msprobe.readImage(image, pcBase, microcorruptionparse)
+	gadgets = findGadgets(words, depth, kinds or terminatorKinds)
+	filterRegex = re.compile(pattern) if pattern else None
+
+	outFP = open(outfile, 'w') if outfile else None
+	for key, addresses in sorted(gadgets.items(), key=lambda gadget: gadget[1][0]):
+		disasm = '; '.join(key)
+		if filterRegex and not filterRegex.search(disasm):
+			continue
+		line = msprobe.hexrep(pcBase + addresses[0] * 2) + ': ' + disasm
+		if len(addresses) > 1:
+			line += f' ({len(addresses) - 1} more)'
+		if outFP:
+			print(line, file=outFP)
+		if not silent:
+			print(line, file=sys.stdout)
+	if outFP:
+		outFP.close()
@@ -12,7 +12,9 @@ import sys
 import pdb
 
 from signal import signal, SIGINT
-from assemble import asmMain
+import assemble
+from assemble import asmMain, asmWatch
+from symbols import SymbolTable, readSymbols, writeSymbols
 
 PC = 0 #Incremented by each disassembled instruction, incremented in words NOT bytes
 asm = []
@@ -35,15 +37,74 @@ If not provided, a prompt will be provided to read from sys.stdin. If -mc is pro
 Microcorruption hex dump.')
 	disasmParser.add_argument('disassembly', default=None, nargs='?')
 	disasmParser.add_argument('-mc', '--microcorruptionparse', action='store_true')
-	disasmParser.set_defaults(microcorruptionparse=False)
+	disasmParser.add_argument('--symbols', default=None, help='Symbol or map file to annotate addresses with.')
+	disasmParser.add_argument('--export-symbols', dest='exportsymbols', default=None, help='File to write symbols to, \
+along with labels for every jump and call target found.')
+	disasmParser.add_argument('--no-aliases', dest='aliases', action='store_false', help='Do not disassemble emulated \
+instructions as such, e.g. output "mov @sp+, pc" rather than "ret".')
+	disasmParser.add_argument('-j', '--jobs', type=int, default=1, help='Number of processes to disassemble large inputs with.')
+	disasmParser.set_defaults(microcorruptionparse=False, aliases=True)
 	disasmParser.set_defaults(disasmdummy = True) #Let us know we're running in disasm mode
 
 	asmParser = subparser.add_parser('asm', help='File to read assembly code from. \
 If not provided, a prompt will be provided to read from sys.stdin.')
 	asmParser.add_argument('assembly', default=None, nargs='?')
+	asmParser.add_argument('-w', '--watch', action='store_true', help='Reassemble the file incrementally every time it changes.')
+	asmParser.add_argument('--symbols', default=None, help='Symbol or map file to predefine labels from.')
+	asmParser.add_argument('--listing', default=None, help='File to write a listing of addresses, encoded words and \
+source lines to, followed by the symbol table.')
+	asmParser.set_defaults(watch=False)
 	asmParser.set_defaults(asmdummy = True) #Let us know we're running in asm mode
 
 
+	diffParser = subparser.add_parser('diff', help='Two files to read assembled code objects from, in text hex format. \
+Both are decoded into basic blocks, which are aligned while ignoring addresses and offsets, and the changed, added \
+and removed blocks are output. If -mc is provided, the files will be parsed as Microcorruption hex dumps.')
+	diffParser.add_argument('a')
+	diffParser.add_argument('b')
+	diffParser.add_argument('-mc', '--microcorruptionparse', action='store_true')
+	diffParser.set_defaults(microcorruptionparse=False)
+	diffParser.set_defaults(diffdummy = True) #Let us know we're running in diff mode
+
+	searchParser = subparser.add_parser('search', help='Files to read assembled code objects from, in text hex format, \
+to search for signatures. Patterns are instructions separated by \';\', in which \'?\' or \'*\' stands for any operand \
+or instruction, e.g. "mov @r15+, ?; cmp #0, ?; jnz *". If no patterns are given, built-in signatures are searched for.')
+	searchParser.add_argument('images', nargs='+')
+	searchParser.add_argument('-p', '--pattern', action='append', default=[], help='Pattern to search for. May be repeated.')
+	searchParser.add_argument('-f', '--signatures', action='append', default=[], help='File of "name: pattern" lines. May be repeated.')
+	searchParser.add_argument('-mc', '--microcorruptionparse', action='store_true')
+	searchParser.add_argument('--every-offset', dest='everyoffset', action='store_true', help='Match at every word, not just decoded instruction boundaries.')
+	searchParser.add_argument('--bench', action='store_true', help='Report search throughput over all images.')
+	searchParser.set_defaults(microcorruptionparse=False, everyoffset=False, bench=False)
+	searchParser.set_defaults(searchdummy = True) #Let us know we're running in search mode
+
+	gadgetsParser = subparser.add_parser('gadgets', help='File to read an assembled code object from, in text hex format, \
+to find ROP gadgets in: instruction sequences starting at any word and ending in ret, br or call. If -mc is provided, \
+the file will be parsed as a Microcorruption hex dump.')
+	gadgetsParser.add_argument('image')
+	gadgetsParser.add_argument('-mc', '--microcorruptionparse', action='store_true')
+	gadgetsParser.add_argument('-d', '--depth', type=int, default=4, help='Maximum number of instructions before the terminator.')
+	gadgetsParser.add_argument('-t', '--terminator', action='append', choices=['ret', 'br', 'call'], help='Only list gadgets ending in these. May be repeated.')
+	gadgetsParser.add_argument('--filter', default=None, help='Only list gadgets whose disassembly matches this regular expression.')
+	gadgetsParser.set_defaults(microcorruptionparse=False)
+	gadgetsParser.set_defaults(gadgetsdummy = True) #Let us know we're running in gadgets mode
+
+	verifyParser = subparser.add_parser('verify', help='Check that the assembler and disassembler agree, by disassembling \
+every valid encoding and a random instruction stream and reassembling the results. Mismatches and the throughput of \
+both directions are reported, and the run fails on any failure not listed as known, or on a performance regression.')
+	verifyParser.add_argument('-n', '--count', type=int, default=10000, help='Length of the random instruction stream.')
+	verifyParser.add_argument('--seed', type=int, default=0, help='Seed for the random instruction stream.')
+	verifyParser.add_argument('--no-exhaustive', dest='exhaustive', action='store_false', help='Skip checking every encoding.')
+	verifyParser.add_argument('--baseline', default=None, help='JSON file of throughputs to check for performance regressions against.')
+	verifyParser.add_argument('--save-baseline', dest='savebaseline', action='store_true', help='Save throughputs to the --baseline file instead.')
+	verifyParser.add_argument('--tolerance', type=float, default=0.2, help='Fraction of baseline throughput that may be lost before failing.')
+	verifyParser.add_argument('--known', default=None, help='JSON file of known failures, which are reported but don\'t fail \
+the run. Defaults to knownfailures.json; pass "" to treat every failure as new.')
+	verifyParser.add_argument('--bench-aliases', dest='benchaliases', action='store_true', help='Only time two-operand \
+disassembly with and without emulated instruction rendering.')
+	verifyParser.set_defaults(exhaustive=True, savebaseline=False, benchaliases=False)
+	verifyParser.set_defaults(verifydummy = True) #Let us know we're running in verify mode
+
 	args = parser.parse_args()
 
 	if len(sys.argv) == 1:
@@ -57,19 +118,42 @@ If not provided, a prompt will be provided to read from sys.stdin.')
 	except AttributeError:
 		disasmMode = False
 
-	if disasmMode:
+	if getattr(args, 'diffdummy', False):
+		from bindiff import diffMain
+		diffMain(args.a, args.b, int(args.loadaddr, 16) if args.loadaddr else 0, args.microcorruptionparse,
+			args.output, args.silent)
+	elif getattr(args, 'searchdummy', False):
+		from search import searchMain
+		searchMain(args.images, args.pattern, args.signatures, int(args.loadaddr, 16) if args.loadaddr else 0,
+			args.microcorruptionparse, args.everyoffset, args.bench, args.output, args.silent)
+	elif getattr(args, 'gadgetsdummy', False):
+		from gadgets import gadgetsMain
+		gadgetsMain(args.image, int(args.loadaddr, 16) if args.loadaddr else 0, args.microcorruptionparse,
+			args.depth, args.terminator, args.filter, args.output, args.silent)
+	elif getattr(args, 'verifydummy', False):
+		from verify import verifyMain, defaultKnownFailures #verify imports this module, so import it only when needed
+		sys.exit(verifyMain(args.exhaustive, args.count, args.seed, args.baseline, args.savebaseline,
+			args.tolerance, args.output, args.silent, args.benchaliases,
+			args.known if args.known is not None else defaultKnownFailures))
+	elif disasmMode:
 		if args.loadaddr == '' or args.microcorruptionparse: #We might have read loadaddr from -mc instead
 			pcBase = 0
 		else:
 			pcBase = int(args.loadaddr, 16)
-		disasmMain(args.disassembly, pcBase, args.microcorruptionparse, args.output, args.silent)
+		disasmMain(args.disassembly, pcBase, args.microcorruptionparse, args.output, args.silent, args.symbols,
+			args.exportsymbols, args.jobs, args.aliases)
+	elif args.watch:
+		if not args.assembly:
+			parser.error('--watch requires a file to read assembly code from.')
+		asmWatch(args.assembly, args.output, args.silent, symbols=args.symbols, loadaddr=int(args.loadaddr or '0', 16),
+			listing=args.listing)
 	else:
-		asmMain(args.assembly, args.output, args.silent)
-
+		asmMain(args.assembly, args.output, args.silent, args.symbols, int(args.loadaddr or '0', 16), args.listing)
 
 
-def disasmMain(disassembly, pcBase=0, microcorruptionparse=False, outfile=None, silent=False):
 
+def disasmMain(disassembly, pcBase=0, microcorruptionparse=False, outfile=None, silent=False, symbols=None, exportSymbols=None,
+	jobs=1, aliases=True):
 	if microcorruptionparse:
 		with open(disassembly) as f:
 			pcBase, strinput = microcorruptionParse(f.read())
@@ -81,42 +165,60 @@ def disasmMain(disassembly, pcBase=0, microcorruptionparse=False, outfile=None,
 
 	outFP = open(outfile, 'w') if outfile else None
 
-	strinput = ''.join(strinput.split()) #First, let's remove spaces.
+	from program import decodeProgram, JUMP_BASE #program imports this module, so import it only when needed
+	#Decoded fields are kept in compact columns, and each instruction's text is rendered only as it's output
+	if jobs > 1:
+		from parallel import decodeParallel
+		program = decodeParallel(parseHex(strinput), jobs, aliases)
+	else:
+		program = decodeProgram(parseHex(strinput))
 
-	#Then, convert each word from little-endian and append to the asm list
-	asm.extend([
-		(
-			int.from_bytes(bytes=bytes.fromhex(strinput[i:i+4]), byteorder='little')
-		)for i in range(0, len(strinput), 4)
-	])
+	symbolTable = None
+	if symbols:
+		sizes = {}
+		symbolTable = SymbolTable(readSymbols(symbols, sizes), sizes, end=pcBase + len(program.words) * 2)
+	discovered = {} #Addresses of jump and call targets, and the labels to export them with
 
-	while PC <= len(asm) - 1: #array index<->array length so - 1
-		ins = asm[PC]
-		insptr = PC #PC, as a global, ends up being incremented in the disassemble function
-		output[insptr] = (ins, disassemble(ins))
+	for position in range(len(program)):
+		currentPC = program.index[position]
+		disasm = program.text(position, cache=False, aliases=aliases)
 
-	for currentPC, (ins, disasm) in output.items():
 		#Deal with xrefs
 		#This is a simple disassembler, with no detailed information
 		#journaled. Jumps are the only thing xref'd within the scope
 		#of this project. So this is fine.
 
-		if disasm[0] == 'j':
+		if program.opcode[position] >= JUMP_BASE:
 			pcOffset = int(disasm[4:], 16) // 2 #Words vs bytes
 			#Instruction address to output
-			xrefInsAddress = hexrep(pcBase + (pcOffset * 2) + (currentPC * 2))
-			#Will give an error here if currentPC + pcOffset isn't a disassembled instruction
-			try:
-				jmpxref = xrefInsAddress + ' <' + output[currentPC + pcOffset][1] + '>'
-			except KeyError:
+			xrefAddress = pcBase + (pcOffset * 2) + (currentPC * 2)
+			xrefInsAddress = hexrep(xrefAddress)
+			if symbolTable and symbolTable.describe(xrefAddress):
+				xrefInsAddress += ' [' + symbolTable.describe(xrefAddress) + ']'
+			discovered.setdefault(xrefAddress, 'loc_' + hexrep(xrefAddress))
+			#Will be None here if currentPC + pcOffset isn't a disassembled instruction
+			xrefPosition = program.find(currentPC + pcOffset)
+			if xrefPosition is not None:
+				jmpxref = xrefInsAddress + ' <' + program.text(xrefPosition, aliases=aliases) + '>'
+			else:
 				jmpxref = xrefInsAddress + ' <Not disassembled>'
 			#Write new final disassembly
 			disasm = disasm[0:4] + jmpxref + ' {' + disasm[4:] + '}'
+		elif symbolTable or exportSymbols:
+			for prefix, address in references(program.words, currentPC):
+				if prefix == '#': #call and br targets
+					discovered[address] = 'sub_' + hexrep(address)
+			if symbolTable:
+				disasm = annotateSymbols(disasm, program.words, currentPC, symbolTable)
 
 		#Append the instruction address
 		insAddress = hexrep(pcBase + (currentPC * 2))
 		disasm = insAddress + ': ' + disasm
 
+		#Label the start of symbols, like the assembler would
+		if symbolTable and symbolTable.exact(pcBase + (currentPC * 2)):
+			disasm = symbolTable.exact(pcBase + (currentPC * 2)) + ':\n' + disasm
+
 		if outFP:
 			print(disasm, file=outFP)
 		if not silent:
@@ -125,6 +227,123 @@ def disasmMain(disassembly, pcBase=0, microcorruptionparse=False, outfile=None,
 	if outFP:
 		outFP.close()
 
+	if exportSymbols:
+		exported = dict(symbolTable.names) if symbolTable else {}
+		for address, label in discovered.items():
+			if not (symbolTable and symbolTable.exact(address)):
+				exported[label] = address
+		writeSymbols(exportSymbols, exported)
+
+def parseHex(strinput):
+	"""Converts a code object in text hex format into a list of words."""
+	strinput = ''.join(strinput.split()) #First, let's remove spaces.
+
+	#Then, convert each word from little-endian
+	return [
+		(
+			int.from_bytes(bytes=bytes.fromhex(strinput[i:i+4]), byteorder='little')
+		)for i in range(0, len(strinput), 4)
+	]
+
+def readImage(filename, pcBase=0, microcorruptionparse=False):
+	"""Reads a code object from a file, returning its load address and its words."""
+	with open(filename) as f:
+		strinput = f.read()
+	if microcorruptionparse:
+		pcBase, strinput = microcorruptionParse(strinput)
+	return pcBase, parseHex(strinput)
+
+def disassembleWords(words, aliases=True):
+	"""Disassembles a list of words from the start, returning (and storing in `output`) a
+	dict of {index: (instruction word, disassembly)}. Emulated instructions are rendered as such if `aliases` is set."""
+	global PC, asm, output #Get PC, asm and output
+	PC = 0
+	asm = words
+	output = {}
+	while PC <= len(asm) - 1: #array index<->array length so - 1
+		ins = asm[PC]
+		insptr = PC #PC, as a global, ends up being incremented in the disassemble function
+		output[insptr] = (ins, disassemble(ins, aliases))
+	return output
+
+def disassembleAt(words, index, aliases=True):
+	"""Disassembles the single instruction at `index` in `words`, returning its disassembly
+	and its length in words (including extension words). Emulated instructions are rendered as such if `aliases` is set."""
+	global PC, asm #Get PC and asm
+	asm = words
+	PC = index
+	disasm = disassemble(words[index], aliases)
+	return disasm, PC - index
+
+def isValidInstruction(instruction):
+	"""Whether a word begins a valid instruction, rather than an unassigned opcode."""
+	if instruction & 0xfc00 == 0x1000: #One-op opcode 7 is unassigned
+		return instruction & 0x0380 != 0x0380
+	return instruction >= 0x2000 #Two-op opcodes 0 through 3 are unassigned
+
+def usesExtensionWord(reg, adrmode):
+	"""Whether an operand with the given register and addressing mode is followed by an extension word."""
+	return (adrmode == 1 and reg != 3) or (adrmode == 3 and reg == 0)
+
+def instructionLength(instruction):
+	"""Returns the length in words (including extension words) of the instruction beginning with
+	the given word, without disassembling it."""
+	if instruction & 0xe000 == 0x2000: #Jump
+		return 1
+	if instruction & 0xfc00 == 0x1000: #One operand
+		return 1 + usesExtensionWord(instruction & 0xf, (instruction >> 4) & 3)
+	return (1 + usesExtensionWord((instruction >> 8) & 0xf, (instruction >> 4) & 3)
+		+ usesExtensionWord(instruction & 0xf, (instruction >> 7) & 1))
+
+def references(words, index):
+	"""
+	Returns the addresses referenced by the instruction at `index`, as (operand prefix, address) pairs in operand order.
+	These are &absolute operands, and the immediate targets of call and br.
+	"""
+	instruction = words[index]
+	refs = []
+	if instruction & 0xe000 == 0x2000: #Jumps are handled with their xrefs
+		return refs
+	if instruction & 0xfc00 == 0x1000: #One operand
+		reg, adrmode = instruction & 0xf, (instruction >> 4) & 3
+		if reg == 2 and adrmode == 1:
+			refs.append(('&', words[index + 1]))
+		elif reg == 0 and adrmode == 3 and instruction & 0xff80 == 0x1280: #call #addr
+			refs.append(('#', words[index + 1]))
+		return refs
+	extension = index + 1
+	srcReg, srcAdrMode = (instruction >> 8) & 0xf, (instruction >> 4) & 3
+	if usesExtensionWord(srcReg, srcAdrMode):
+		if srcReg == 2 and srcAdrMode == 1:
+			refs.append(('&', words[extension]))
+		elif srcReg == 0 and srcAdrMode == 3 and instruction & 0xf0cf == 0x4000: #br #addr
+			refs.append(('#', words[extension]))
+		extension += 1
+	if instruction & 0xf == 2 and instruction & 0x80: #&dst
+		refs.append(('&', words[extension]))
+	return refs
+
+def annotateSymbols(disasm, words, index, table):
+	"""Appends the symbol for each address referenced by an instruction after its operand, e.g. call #0x4438 [main]."""
+	position = 0
+	for prefix, address in references(words, index):
+		operand = prefix + hex(address)
+		symbol = table.describe(address)
+		position = disasm.find(operand, position)
+		if position < 0:
+			break
+		position += len(operand)
+		if symbol:
+			disasm = disasm[:position] + f' [{symbol}]' + disasm[position:]
+	return disasm
+
+def jumpTarget(index, instruction):
+	"""Returns the word index a jump instruction at `index` jumps to."""
+	offset = instruction & 0x3ff
+	if offset & 0x200: #Sign extend
+		offset -= 0x400
+	return index + 1 + offset
+
 registerNames = ['pc', 'sp', 'sr', 'cg', 'r4', 'r5', 'r6', 'r7', 'r8', 'r9', 'r10', 'r11', 'r12', 'r13', 'r14', 'r15']
 
 def bitrep(number, bits = 16):
@@ -153,8 +372,9 @@ def microcorruptionParse(inp):
 		output = output + i[7 : 7 + 40]
 	return (loadaddr, output)
 
-def disassemble(instruction):
-	"""Main disassembly, calls other disassembly functions given a 2-byte instruction."""
+def disassemble(instruction, aliases=True):
+	"""Main disassembly, calls other disassembly functions given a 2-byte instruction.
+	Emulated instructions are rendered as such if `aliases` is set."""
 	#Let's start by getting the binary representation.
 	#Need to invert bytes because little endian.
 	ins = bitrep(instruction)
@@ -164,7 +384,7 @@ def disassemble(instruction):
 	elif ins[0:6] == '000100':
 		return disassembleOneOpInstruction(ins)
 	else:
-		return disassembleTwoOpInstruction(ins)
+		return disassembleTwoOpInstruction(ins, aliases)
 
 oneOpOpcodes = ['rrc', 'swpb', 'rra', 'sxt', 'push', 'call', 'reti']
 def disassembleOneOpInstruction(ins):
@@ -201,11 +421,49 @@ def disassembleJumpInstruction(ins):
 
 	return jumpOpcodes[condition] + ' ' + plus + hex(pcOffset)
 
+def buildAliasTables():
+	"""
+	Builds lookup tables of emulated instructions from the assembler's `emulatedOpcodes`, so the two always agree.
+	Each table maps decoded fields to (alias, operand), where operand says which operand the alias keeps
+	('src', 'dst', or None for zero-operand aliases). They are checked in this order:
+	* exact: (opcode, src reg, src mode, dst reg, dst mode), for aliases like ret = mov @sp+, pc
+	* by dst: (opcode, dst reg, dst mode), for aliases like br = mov {reg}, pc
+	* same operand: opcode, for aliases like rla = add {reg}, {reg}
+	* by src: (opcode, src reg, src mode), for aliases like inc = add #1, {reg}
+	"""
+	exact, byDst, sameOperand, bySrc = {}, {}, {}, {}
+	for alias, real in assemble.emulatedOpcodes.items():
+		mnemonic, operands = real.split(' ', 1)
+		if mnemonic not in assemble.twoOpOpcodes: #Jump aliases are just alternate names
+			continue
+		opcodeID = assemble.twoOpOpcodes.index(mnemonic)
+		src, dst = operands.split(', ')
+		if src == dst == '{reg}':
+			sameOperand[opcodeID] = (alias, 'dst')
+			continue
+		if src != '{reg}':
+			notUsed, srcAdrMode, srcReg = assemble.assembleRegister(src)
+		if dst != '{reg}':
+			notUsed, dstAdrMode, dstReg = assemble.assembleRegister(dst, isDestReg=True)
+		if src == '{reg}':
+			byDst[(opcodeID, dstReg, dstAdrMode)] = (alias, 'src')
+		elif dst == '{reg}':
+			bySrc[(opcodeID, srcReg, srcAdrMode)] = (alias, 'dst')
+		else:
+			exact[(opcodeID, srcReg, srcAdrMode, dstReg, dstAdrMode)] = (alias, None)
+	#Moving any operand onto itself does nothing, not just r3
+	sameOperand.setdefault(assemble.twoOpOpcodes.index('mov'), ('nop', None))
+	return exact, byDst, sameOperand, bySrc
+
+aliasExact, aliasByDst, aliasSameOperand, aliasBySrc = buildAliasTables()
+
 #Two-operand opcodes start at 4 (0b0100)
 twoOpOpcodes = ['!!!', '!!!', '!!!', '!!!', 'mov', 'add', 'addc', 'subc', 'sub', 'cmp', 'dadd', 'bit', 'bic', 'bis', 'xor', 'and']
-def disassembleTwoOpInstruction(ins):
-	"""Given a two-operand instruction (format III) in a 16-bit string, output disassembly."""
+def disassembleTwoOpInstruction(ins, aliases=True):
+	"""Given a two-operand instruction (format III) in a 16-bit string, output disassembly.
+	Emulated instructions are rendered as such if `aliases` is set."""
 	global PC #Get PC
+	startPC = PC
 
 	bytemode = '.b' if ins[9] == '1' else ''
 	opcodeID = int(ins[0:4], 2)
@@ -220,91 +478,36 @@ def disassembleTwoOpInstruction(ins):
 	dstReg = int(ins[12:], 2)
 	dstAdrMode = int(ins[8], 2)
 
-	regOutputDst, extWordDst = disassembleAddressingMode(dstReg, dstAdrMode)
+	regOutputDst, extWordDst = disassembleAddressingMode(dstReg, dstAdrMode, isDestReg=True)
 	PC += 1 if extWordDst else 0
 
 	PC += 1 #Instruction word
 
 	finalins = opcode + bytemode + ' ' + regOutputSrc + ', ' + regOutputDst
 
-	#Disassemble pseudo (emulated) instructions
-
-	#These are the easy ones to catch
-	finalins = 'ret' if finalins == 'mov @sp+, pc' else finalins
-
-	#Status register twiddling
-	finalins = 'clrc' if finalins == 'bic #1, sr' else finalins
-	finalins = 'setc' if finalins == 'bis #1, sr' else finalins
-	finalins = 'clrz' if finalins == 'bic #2, sr' else finalins
-	finalins = 'setz' if finalins == 'bis #2, sr' else finalins
-	finalins = 'clrn' if finalins == 'bic #4, sr' else finalins
-	finalins = 'setn' if finalins == 'bis #4, sr' else finalins
-	finalins = 'dint' if finalins == 'bic #8, sr' else finalins
-	finalins = 'eint' if finalins == 'bic #8, sr' else finalins
-	#nop = mov dst, dst
-	finalins = 'nop' if opcode == 'mov' and regOutputSrc == regOutputDst else finalins
-
-	#These ones require a small amount of effort because it uses any register.
-	#All of these are one-operand instructions, so if we need to reassemble
-	#the instruction, it'll simply follow the one-operand format.
-
-	reassembleins = True
-	usesDest = True
-
-	#Branch. Requires a little bit of extra sanity checking
-	#because it could get mistaken for ret
-	if opcode == 'mov' and regOutputDst == 'pc' and finalins != 'ret': #br = mov src, pc
-		opcode = 'br'
-		usesDest = False #We're actually using src here
-
-	#Pop. Could also get mistaken for ret.
-	elif opcode == 'mov' and regOutputSrc == '@sp+' and finalins != 'ret': #pop = mov @sp+, dst
-		opcode = 'pop'
-
-	#Shift and rotate left
-
-	elif opcode == 'add' and srcReg == dstReg: #rla = add dst, dst
-		opcode = 'rla'
-	elif opcode == 'addc' and srcReg == dstReg: #rlc = addc dst, dst
-		opcode = 'rlc'
-
-	#Common one-operand instructions
-
-	elif opcode == 'xor' and regOutputSrc == '#0xffff {-1}': #inv = xor 0xffff, dst
-		opcode = 'inv'
-	#Extra sanity checking to prevent being mistaken for nop
-	elif opcode == 'mov' and regOutputSrc == '#0' and regOutputDst != '#0': #clr = mov #0, dst
-		opcode = 'clr'
-	elif opcode == 'cmp' and regOutputSrc == '#0': #tst = cmp #0, dst
-		opcode = 'tst'
-
-
-	#Increment and decrement (by one or two)
-
-	elif opcode == 'sub' and regOutputSrc == '#1': #dec = sub #1, dst
-		opcode = 'dec'
-	elif opcode == 'sub' and regOutputSrc == '#2': #decd = sub #2, dst
-		opcode = 'decd'
-	elif opcode == 'add' and regOutputSrc == '#1': #inc = add #1, dst
-		opcode = 'inc'
-	elif opcode == 'add' and regOutputSrc == '#2': #incd = add #1, dst
-		opcode = 'incd'
-
-	#Add and subtract only the carry bit:
-
-	elif opcode == 'addc' and regOutputSrc == '#0': #adc = addc #0, dst
-		opcode = 'adc'
-	elif opcode == 'dadd' and regOutputSrc == '#0': #dadc = dadd #0, dst
-		opcode = 'dadc'
-	elif opcode == 'subc' and regOutputSrc == '#0': #sbc = subc #0, dst
-		opcode = 'sbc'
-
-	#The instruction is not an emulated instruction
-	else:
-		reassembleins = False
-
-	if reassembleins:
-		finalins = opcode + bytemode + ' ' + (regOutputDst if usesDest else regOutputSrc)
+	#Disassemble pseudo (emulated) instructions, by looking up the decoded fields rather than the text
+	if aliases:
+		#Indexes must match too, and pc relative operands never match: their extension words sit at different addresses
+		sameOperand = (srcReg, srcAdrMode) == (dstReg, dstAdrMode) and not (srcReg == 0 and srcAdrMode == 1) and (
+			not extWordSrc or asm[startPC + 1] == asm[startPC + 2])
+		for alias in (
+			aliasExact.get((opcodeID, srcReg, srcAdrMode, dstReg, dstAdrMode)),
+			aliasByDst.get((opcodeID, dstReg, dstAdrMode)),
+			aliasSameOperand.get(opcodeID) if sameOperand else None,
+			aliasBySrc.get((opcodeID, srcReg, srcAdrMode)),
+		):
+			if alias is None:
+				continue
+			mnemonic, operand = alias
+			#The zero-operand aliases are all one word, word mode instructions, and must stay as long as what they replace
+			if operand is None and (bytemode or extWordSrc or extWordDst):
+				continue
+			if mnemonic == 'clr' and (dstReg, dstAdrMode) == (3, 0): #mov #0, cg isn't clr (in word mode it's nop)
+				continue
+			finalins = mnemonic + bytemode
+			if operand:
+				finalins += ' ' + (regOutputSrc if operand == 'src' else regOutputDst)
+			break
 
 	if '!!!' in finalins:
 		finalins = finalins.replace('!!!', f'!{int(ins,2):04x}!')
@@ -313,7 +516,7 @@ def disassembleTwoOpInstruction(ins):
 
 adrModes = ['{register}', '{index}({register})', '@{register}', '@{register}+']
 
-def disassembleAddressingMode(reg, adrmode):
+def disassembleAddressingMode(reg, adrmode, isDestReg=False):
 	"""Outputs disassembly of a register's addressing mode and whether an extension
 	word was used (to update PC accordingly in the calling function),
 	given the register number and addressing mode number."""
@@ -335,15 +538,16 @@ def disassembleAddressingMode(reg, adrmode):
 			regOutput = '#8'
 
 	elif reg == 3:
-		if adrmode == 0:
+		if adrmode == 0 and isDestReg: #Constants only come from CG as a source; as a destination it's a register
+			regOutput = registerNames[reg]
+		elif adrmode == 0:
 			regOutput = '#0'
 		elif adrmode == 1:
 			regOutput = '#1'
 		elif adrmode == 2:
 			regOutput = '#2'
 		elif adrmode == 3:
-			#Just a little reminder that all bits set == -1
-			regOutput = '#0xffff {-1}'
+			regOutput = '#-1' #All bits set, which the assembler reads back as the same constant
 
 	elif adrmode == 0:
 		regOutput = adrModes[adrmode].format(register=registerNames[reg])
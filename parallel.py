@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+#Parallel disassembly of large images.
+#The image is split into chunks, which are decoded and rendered by a process pool. Each worker starts decoding a
+#little before its chunk, so that by the time it reaches the chunk it has (almost always) fallen into step with the
+#instruction boundaries a sequential decode would find. The chunks are then stitched together in order, starting each
+#one at the boundary the previous chunk actually ended on. Where a worker didn't resynchronize in time, the stitch
+#decodes from that boundary itself until it meets the worker's boundaries, so the result always matches a sequential
+#decode exactly.
+#Run this file directly to benchmark it against the sequential decode.
+
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from multiprocessing import Pool, cpu_count
+
+from program import DecodedProgram, decodeProgram
+
+overlap = 16 #Words decoded before each chunk to resynchronize on instruction boundaries
+minChunkSize = 4096 #Words per chunk, at the least
+
+columns = ('index', 'opcode', 'modes')
+
+def decodeChunk(job):
+	"""
+	Worker: decodes the words of a chunk, starting `lead` words before the chunk itself.
+	Returns the columns and rendered texts of the instructions starting within the chunk, with absolute indexes.
+	"""
+	words, base, lead, size, aliases = job #Words of the chunk with its lead-in and tail, and the chunk's absolute index
+	program = DecodedProgram(words)
+	first = None #First row starting within the chunk
+	texts = []
+	index = 0
+	while index < lead + size:
+		try:
+			length = program.append(index)
+		except IndexError: #Cut off at the end of the image; the stitch will find out whether it matters
+			break
+		if index >= lead:
+			if first is None:
+				first = len(program) - 1
+			texts.append(program.text(len(program) - 1, cache=False, aliases=aliases))
+		index += length
+	if first is None:
+		return {column: array(getattr(program, column).typecode) for column in columns}, texts
+	result = {column: getattr(program, column)[first:] for column in columns}
+	result['index'] = array('I', (index + base - lead for index in result['index']))
+	return result, texts
+
+def decodeParallel(words, jobs=None, aliases=True):
+	"""
+	Decodes a list of words from the start into a `DecodedProgram`, using a pool of `jobs` processes.
+	The workers render each instruction's text as they go, with emulated instructions rendered as such if `aliases` is set.
+	"""
+	jobs = jobs or cpu_count()
+	program = DecodedProgram(words)
+	chunkSize = max(minChunkSize, -(-len(words) // (jobs * 4))) #A few chunks per process, to balance the load
+	chunks = [(start, min(start + chunkSize, len(words))) for start in range(0, len(words), chunkSize)]
+	work = []
+	for start, end in chunks:
+		lead = min(overlap, start)
+		#Two words past the end, for the extension words of the chunk's last instruction
+		work.append((program.words[start - lead : end + 2], start, lead, end - start, aliases))
+	with Pool(jobs) as pool:
+		results = pool.map(decodeChunk, work)
+
+	expected = 0 #Index where the next instruction starts, as found by the stitch so far
+	for (start, end), (result, texts) in zip(chunks, results):
+		while expected < end:
+			position = bisect_left(result['index'], expected)
+			if position < len(result['index']) and result['index'][position] == expected:
+				#In step with the worker from here on
+				firstRow = len(program)
+				for column in columns:
+					getattr(program, column).extend(result[column][position:])
+				for row, text in enumerate(texts[position:]):
+					program.texts[(firstRow + row, aliases)] = text
+				lastIndex = program.index[-1]
+				expected = lastIndex + 1 + (program.modes[-1] >> 4)
+				continue
+			#Not in step yet, so decode this instruction here
+			expected += program.append(expected)
+	return program
+
+def benchmark(count=200000, seed=0):
+	"""Times sequential and parallel decoding and rendering of a random stream, and checks they match."""
+	import random
+	from verify import randomStream
+	words = randomStream(count, random.Random(seed))
+
+	start = time.perf_counter()
+	sequential = decodeProgram(words)
+	sequentialTexts = [sequential.text(position, cache=False) for position in range(len(sequential))]
+	sequentialTime = time.perf_counter() - start
+	print(f'sequential: {sequentialTime:.2f}s')
+
+	jobs = 1
+	while jobs <= cpu_count():
+		start = time.perf_counter()
+		program = decodeParallel(words, jobs)
+		texts = [program.text(position, cache=False) for position in range(len(program))]
+		elapsed = time.perf_counter() - start
+		matches = texts == sequentialTexts and all(getattr(program, column) == getattr(sequential, column) for column in columns)
+		print(f'{jobs} processes: {elapsed:.2f}s ({sequentialTime / elapsed:.2f}x)' + ('' if matches else ' MISMATCH'))
+		jobs *= 2
+
+if __name__ == '__main__':
+	benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+#Memory-compact storage of decoded programs.
+#Rather than a dict of {index: (word, disassembly)}, each decoded field is kept in its own array column,
+#so an instruction costs a few bytes instead of hundreds. Disassembly text is only rendered when asked for,
+#from the image itself, so only the fields needed to walk and classify instructions are kept.
+#Run this file directly to compare memory use against the dict representation.
+
+import sys
+import tracemalloc
+from array import array
+from bisect import bisect_left
+
+import msprobe
+
+#Opcode ids: two-op opcodes keep their own 4 bit opcode (4 through 15), one-op opcodes are 16 plus
+#their opcode, and jumps are 24 plus their condition. 0 through 3 are unassigned two-op opcodes.
+ONE_OP_BASE = 16
+JUMP_BASE = 24
+
+class DecodedProgram:
+	"""
+	A decoded program, stored as parallel array columns with one entry per instruction:
+	* `index`: word index of the instruction in the image
+	* `opcode`: opcode id (see ONE_OP_BASE and JUMP_BASE)
+	* `modes`: source addressing mode in bits 0-1, destination addressing mode in bit 2, byte mode in bit 3
+	  and the number of extension words in bits 4-5
+	Registers and extension words are read from `words`, the image itself, when text is rendered.
+	"""
+	__slots__ = ('words', 'index', 'opcode', 'modes', 'texts')
+
+	def __init__(self, words) -> None:
+		self.words = array('H', words)
+		self.index = array('I') #4 bytes, where 'L' is 8 on 64 bit Linux
+		self.opcode = array('B')
+		self.modes = array('B')
+		self.texts = {} #(Position, aliases) and disassembly, for texts that have been asked for with caching
+
+	def __len__(self):
+		return len(self.index)
+
+	def word(self, position):
+		"""Returns the first word of the instruction at `position`."""
+		return self.words[self.index[position]]
+
+	def length(self, position):
+		"""Returns the length in words of the instruction at `position`, including extension words."""
+		return 1 + (self.modes[position] >> 4)
+
+	def text(self, position, cache=True, aliases=True):
+		"""
+		Renders the disassembly of the instruction at `position`, keeping it for next time if `cache` is set.
+		Emulated instructions are rendered as such if `aliases` is set.
+		"""
+		if (position, aliases) in self.texts:
+			return self.texts[(position, aliases)]
+		disasm = msprobe.disassembleAt(self.words, self.index[position], aliases)[0]
+		if cache:
+			self.texts[(position, aliases)] = disasm
+		return disasm
+
+	def find(self, index):
+		"""Returns the position of the instruction starting at word `index`, or None if no instruction does."""
+		position = bisect_left(self.index, index)
+		if position < len(self.index) and self.index[position] == index:
+			return position
+		return None
+
+	def append(self, index):
+		"""Decodes the instruction at word `index` into a new row, returning its length in words."""
+		instruction = self.words[index]
+		if instruction & 0xe000 == 0x2000: #Jump
+			opcode = JUMP_BASE + ((instruction >> 10) & 7)
+			srcReg = srcAdrMode = dstReg = dstAdrMode = byteMode = extensions = 0
+		elif instruction & 0xfc00 == 0x1000: #One operand
+			opcode = ONE_OP_BASE + ((instruction >> 7) & 7)
+			srcReg, srcAdrMode = instruction & 0xf, (instruction >> 4) & 3
+			dstReg = dstAdrMode = 0
+			byteMode = (instruction >> 6) & 1
+			extensions = msprobe.usesExtensionWord(srcReg, srcAdrMode)
+		else:
+			opcode = instruction >> 12
+			srcReg, srcAdrMode = (instruction >> 8) & 0xf, (instruction >> 4) & 3
+			dstReg, dstAdrMode = instruction & 0xf, (instruction >> 7) & 1
+			byteMode = (instruction >> 6) & 1
+			extensions = msprobe.usesExtensionWord(srcReg, srcAdrMode) + msprobe.usesExtensionWord(dstReg, dstAdrMode)
+
+		#Raises IndexError on an instruction cut off at the end of the image, as the disassembler does.
+		#This is checked first, so that no column is left a row longer than the others.
+		if index + extensions >= len(self.words):
+			raise IndexError('instruction cut off at the end of the image')
+
+		self.index.append(index)
+		self.opcode.append(opcode)
+		self.modes.append(srcAdrMode | (dstAdrMode << 2) | (byteMode << 3) | (extensions << 4))
+		return 1 + extensions
+
+def decodeProgram(words):
+	"""Decodes a list of words from the start into a `DecodedProgram`."""
+	program = DecodedProgram(words)
+	index = 0
+	while index < len(program.words):
+		index += program.append(index)
+	return program
+
+def measure(build):
+	"""Returns the memory still allocated by the result of `build()`, in bytes."""
+	tracemalloc.start()
+	result = build()
+	size = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	del result
+	return size
+
+def memoryBenchmark(count=100000, seed=0):
+	"""Compares the memory used per instruction by `disassembleWords` and `decodeProgram` on a random stream."""
+	import random
+	from verify import randomStream
+	words = randomStream(count, random.Random(seed))
+
+	results = {
+		'dict of (word, disassembly)': measure(lambda: msprobe.disassembleWords(list(words))),
+		'DecodedProgram': measure(lambda: decodeProgram(words)),
+	}
+	for name, size in results.items():
+		print(f'{name}: {size / count:.1f} bytes/instruction')
+
+if __name__ == '__main__':
+	memoryBenchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+#Signature search over decoded instruction streams.
+#A pattern is a sequence of instructions separated by ';', in which operands (or parts of them) may be wildcards:
+#    mov @r15+, ?; cmp #0, ?; jnz *
+#Each instruction is compiled into a mask and value over its first word, plus any extension words that must match.
+#An instruction can compile to several such alternatives, as an immediate can be encoded in several ways.
+#All patterns are indexed by their first instruction, so a single pass over an image checks every signature at once.
+
+import sys
+import time
+
+import msprobe
+from assemble import emulatedOpcodes, encodeInstruction, getOpcode, jumpOpcodes, oneOpOpcodes, swapEndianness
+
+builtinSignatures = {
+	#Microcorruption's interrupt stub: the interrupt number is placed in the high byte of sr, then 0x10 is called
+	'INT': 'mov 0x2(sp), r14; push sr; mov r14, r15; swpb r15; mov r15, sr; bis #0x8000, sr; call #0x10',
+}
+
+class PatternError(Exception):
+	"""
+	`PatternError` is raised when a pattern cannot be compiled
+	"""
+	def __init__(self, pattern: str, reason: str) -> None:
+		self.pattern = pattern
+		self.reason = reason
+
+immediateSources = [(0, 3), (2, 2), (2, 3), (3, None)]
+"""
+Register and addressing mode of each way an immediate can be encoded: @pc+ followed by the value, or one of the
+constant generators (r2 in modes 2 and 3, for 4 and 8, and r3 in any mode, for 0, 1, 2 and -1).
+"""
+
+def isWildcard(operand):
+	return operand in ('?', '*')
+
+def compileOperand(operand):
+	"""
+	Compiles one operand of a pattern instruction, returning the operand to assemble in its place, the part of its
+	field that is a wildcard ('all', 'reg', 'immediate' or None), and whether its extension word is a wildcard.
+	"""
+	if isWildcard(operand):
+		return 'r4', 'all', True
+	extensionWildcard = False
+	if operand.startswith('#?'): #Any immediate, however it's encoded
+		return '#1234', 'immediate', True
+	if operand.startswith('&?'): #Any absolute address
+		operand = operand[0] + '1234'
+		extensionWildcard = True
+	elif operand.startswith('?('): #Any index
+		operand = '0' + operand[1:]
+		extensionWildcard = True
+	if '?' in operand: #Any register
+		return operand.replace('?', 'r4'), 'reg', extensionWildcard
+	return operand, None, extensionWildcard
+
+def immediateAlternatives(mask, value, regShift, srcExtension, dstExtension):
+	"""
+	Expands a compiled instruction whose source is any immediate into one alternative per immediate source.
+	`regShift` is the position of the source register field.
+	"""
+	field = (0xf << regShift) | 0x0030 #Source register and addressing mode
+	alternatives = []
+	for reg, adrmode in immediateSources:
+		fieldMask = field if adrmode is not None else 0xf << regShift
+		fieldValue = (reg << regShift) | ((adrmode or 0) << 4)
+		alternatives.append(((mask & ~field) | fieldMask, (value & ~field) | fieldValue, srcExtension, dstExtension))
+	return tuple(alternatives)
+
+def compileInstruction(ins):
+	"""
+	Compiles one instruction of a pattern into a tuple of alternatives, any of which may match.
+	Each alternative is (mask, value, source extension, destination extension): the instruction word must equal
+	`value` once masked with `mask`, and each extension word must equal its expected value, unless it is None.
+	"""
+	ins = ins.strip()
+	if isWildcard(ins): #Any instruction at all
+		return ((0, 0, None, None),)
+
+	#Expand emulated instructions into the real instruction, keeping wildcards in place
+	opcode, byteMode = getOpcode(ins)
+	operands = ins[ins.find(' ') + 1 :] if ' ' in ins else ''
+	if opcode in emulatedOpcodes:
+		ins = emulatedOpcodes[opcode].format(reg=operands)
+		if byteMode:
+			ins = ins.replace(' ', '.b ', 1)
+		opcode = getOpcode(ins)[0]
+		operands = ins[ins.find(' ') + 1 :] if ' ' in ins else ''
+	mnemonic = ins.split(' ')[0]
+
+	if opcode in jumpOpcodes:
+		if isWildcard(operands.strip()):
+			word = swapEndianness(encodeInstruction(mnemonic + ' 0')[0][0])
+			return ((0xfc00, word & 0xfc00, None, None),)
+		return ((0xffff, swapEndianness(encodeInstruction(ins)[0][0]), None, None),)
+
+	if opcode in oneOpOpcodes:
+		operand, wildcard, extensionWildcard = compileOperand(operands.strip())
+		words = [swapEndianness(word) for word in encodeInstruction(mnemonic + ' ' + operand)[0]]
+		mask = 0xffff & ~{'all': 0x003f, 'reg': 0x000f, 'immediate': 0, None: 0}[wildcard]
+		srcExtension = words[1] if len(words) > 1 and not extensionWildcard else None
+		if wildcard == 'immediate':
+			return immediateAlternatives(mask, words[0] & mask, 0, srcExtension, None)
+		return ((mask, words[0] & mask, srcExtension, None),)
+
+	if ',' not in operands:
+		raise PatternError(ins, 'Two-operand instructions need two operands.')
+	src, dst = (operand.strip() for operand in operands.split(',', 1))
+	src, srcWildcard, srcExtensionWildcard = compileOperand(src)
+	dst, dstWildcard, dstExtensionWildcard = compileOperand(dst)
+	words = [swapEndianness(word) for word in encodeInstruction(mnemonic + ' ' + src + ', ' + dst)[0]]
+	mask = (0xffff & ~{'all': 0x0f30, 'reg': 0x0f00, 'immediate': 0, None: 0}[srcWildcard]
+		& ~{'all': 0x008f, 'reg': 0x000f, None: 0}[dstWildcard])
+
+	srcHasExtension = msprobe.usesExtensionWord((words[0] >> 8) & 0xf, (words[0] >> 4) & 3)
+	srcExtension = words[1] if srcHasExtension and not srcExtensionWildcard else None
+	dstExtension = None
+	if len(words) > 1 + srcHasExtension and not dstExtensionWildcard:
+		dstExtension = words[1 + srcHasExtension]
+	if srcWildcard == 'immediate':
+		return immediateAlternatives(mask, words[0] & mask, 8, srcExtension, dstExtension)
+	return ((mask, words[0] & mask, srcExtension, dstExtension),)
+
+def compilePattern(pattern):
+	"""Compiles a pattern of ';' separated instructions into a tuple of compiled instructions."""
+	try:
+		return tuple(compileInstruction(ins) for ins in pattern.split(';'))
+	except PatternError:
+		raise
+	except Exception as exp: #The assembler rejected part of the pattern
+		raise PatternError(pattern, getattr(exp, 'reason', str(exp)))
+
+def matchInstruction(words, index, element):
+	"""Whether the instruction at `index` matches any alternative of a compiled pattern instruction."""
+	instruction = words[index]
+	for mask, value, srcExtension, dstExtension in element:
+		if instruction & mask != value:
+			continue
+		if srcExtension is not None:
+			if index + 1 >= len(words) or words[index + 1] != srcExtension:
+				continue
+		if dstExtension is not None:
+			dstIndex = index + 1 + msprobe.usesExtensionWord((instruction >> 8) & 0xf, (instruction >> 4) & 3)
+			if dstIndex >= len(words) or words[dstIndex] != dstExtension:
+				continue
+		return True
+	return False
+
+class SignatureSet:
+	"""
+	A compiled set of named patterns, indexed by their first instruction: for each distinct mask, a dict of
+	masked values to the patterns starting with them. A pattern is indexed under each alternative of its first
+	instruction; alternatives never overlap, so it's still found at most once per index.
+	"""
+	def __init__(self, signatures: dict) -> None:
+		self.index = {}
+		for name, pattern in signatures.items():
+			compiled = compilePattern(pattern)
+			for mask, value, srcExtension, dstExtension in compiled[0]:
+				self.index.setdefault(mask, {}).setdefault(value, []).append((name, compiled))
+
+	def matchAt(self, words, index):
+		"""Returns the names of the signatures matching at `index`."""
+		matches = []
+		for mask, values in self.index.items():
+			candidates = values.get(words[index] & mask)
+			if not candidates:
+				continue
+			for name, compiled in candidates:
+				position = index
+				for element in compiled:
+					if position >= len(words) or not matchInstruction(words, position, element):
+						break
+					position += msprobe.instructionLength(words[position])
+				else:
+					matches.append(name)
+		return matches
+
+	def search(self, words, everyOffset=False):
+		"""
+		Scans an image in a single pass, returning a list of (word index, signature name).
+		Only instruction boundaries found by decoding from the start are checked, unless `everyOffset` is set.
+		"""
+		matches = []
+		index = 0
+		while index < len(words):
+			for name in self.matchAt(words, index):
+				matches.append((index, name))
+			index += 1 if everyOffset else msprobe.instructionLength(words[index])
+		return matches
+
+def readSignatures(filename):
+	"""Reads signatures from a file, with one 'name: pattern' per line. Lines beginning with '//' are comments."""
+	signatures = {}
+	with open(filename) as fp:
+		for line in fp:
+			line = line.strip()
+			if not line or line.startswith('//'):
+				continue
+			name, pattern = line.split(':', 1)
+			signatures[name.strip()] = pattern.strip()
+	return signatures
+
+def searchMain(images, patterns=(), signatureFiles=(), pcBase=0, microcorruptionparse=False, everyOffset=False,
+	benchmark=False, outfile=None, silent=False):
+	"""Searches images for signatures, outputting every match."""
+	signatures = {}
+	for pattern in patterns:
+		signatures[pattern] = pattern
+	for filename in signatureFiles:
+		signatures.update(readSignatures(filename))
+	if not signatures:
+		signatures = builtinSignatures
+	try:
+		signatureSet = SignatureSet(signatures)
+	except PatternError as exp:
+		print(f'Invalid pattern "{exp.pattern}": {exp.reason}')
+		sys.exit(-1)
+
+	outFP = open(outfile, 'w') if outfile else None
+	scanned = found = 0
+	elapsed = 0
+	for image in images:
+		imageBase, words = msprobe.readImage(image, pcBase, microcorruptionparse)
+		start = time.perf_counter()
+		matches = signatureSet.search(words, everyOffset)
+		elapsed += time.perf_counter() - start
+		scanned += len(words)
+		found += len(matches)
+		for index, name in matches:
+			line = f'{image}: {msprobe.hexrep(imageBase + index * 2)}: {name}'
+			if outFP:
+				print(line, file=outFP)
+			if not silent:
+				print(line, file=sys.stdout)
+
+	if benchmark:
+		rate = scanned / elapsed if elapsed else 0
+		print(f'{len(signatures)} signatures, {len(images)} images, {scanned} words in {elapsed:.3f}s '
+			f'({rate:.0f} words/sec), {found} matches')
+	if outFP:
+		outFP.close()
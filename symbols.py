@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+#Symbol files: reading, writing, and lookup of the symbol covering an address.
+#Any line holding exactly one address and one name is read as a symbol, so linker map files
+#(0x0000c01a  main), symbol lists (4438 main, 4438 <main>) and assignments (main = 0x4438) all work.
+#Lines giving a size too, like those of nm -S (0000c01a 0000002a T main), are read along with the size.
+#Lines with anything else on them, like map file section headers, are skipped.
+
+import re
+from bisect import bisect_right
+
+maxOffset = 0x800 #Furthest past a symbol without a size that an address is still described by it, in bytes
+
+class SymbolTable:
+	"""
+	Symbols sorted by address, with the symbol covering an address found by binary search.
+	Each symbol covers the addresses up to the next symbol, but no further than its size if it has one,
+	or `maxOffset` if not. Symbols within the image (before `end`) don't cover anything past its end.
+	"""
+	def __init__(self, symbols: dict = None, sizes: dict = None, end: int = None) -> None:
+		self.names = {} #Symbol name and its address
+		self.byAddress = {} #Address and its symbol name
+		self.sizes = sizes or {} #Symbol name and its size in bytes, where known
+		self.end = end #Address just past the end of the image, if known
+		#Built in bulk and sorted once, so loading large tables stays O(n log n)
+		for name, address in (symbols or {}).items():
+			self.names[name] = address
+			self.byAddress.setdefault(address, name)
+		self.addresses = sorted(self.byAddress) #Sorted addresses
+
+	def exact(self, address: int):
+		"""Returns the name of the symbol at exactly `address`, or None."""
+		return self.byAddress.get(address)
+
+	def describe(self, address: int):
+		"""Describes an address as the symbol covering it plus an offset, e.g. main+0x4, or None if no symbol does."""
+		position = bisect_right(self.addresses, address) - 1
+		if position < 0:
+			return None
+		base = self.addresses[position]
+		name = self.byAddress[base]
+		if base == address:
+			return name
+		limit = base + self.sizes.get(name, maxOffset)
+		if self.end is not None and base < self.end:
+			limit = min(limit, self.end)
+		return f'{name}+{hex(address - base)}' if address < limit else None
+
+def readSymbols(filename: str, sizes: dict = None) -> dict:
+	"""
+	Reads a symbol file, returning a dict of {name: address}.
+	If a `sizes` dict is given, the sizes of the symbols that have one are added to it, as {name: size}.
+	"""
+	symbols = {}
+	with open(filename) as fp:
+		for line in fp:
+			tokens = re.sub(r'[<>=:,;]', ' ', line).split()
+			#Address, size, one letter symbol type and name, as output by nm -S
+			if len(tokens) == 4 and isHex(tokens[0]) and isHex(tokens[1]) and len(tokens[2]) == 1:
+				symbols[tokens[3]] = int(tokens[0], 16)
+				if sizes is not None:
+					sizes[tokens[3]] = int(tokens[1], 16)
+				continue
+			if len(tokens) != 2:
+				continue
+			#Names like 'add' look like hex too, so prefer the token with a 0x prefix, then the first one
+			candidates = [token for token in tokens if isHex(token)]
+			if not candidates:
+				continue
+			prefixed = [token for token in candidates if token.lower().startswith('0x')]
+			address = (prefixed or candidates)[0]
+			name = tokens[1] if address is tokens[0] else tokens[0]
+			symbols[name] = int(address, 16)
+	return symbols
+
+def isHex(token: str) -> bool:
+	return re.fullmatch(r'(0[xX])?[0-9A-Fa-f]+', token) is not None
+
+def writeSymbols(filename: str, symbols: dict):
+	"""Writes symbols to a file, one 'address name' per line, sorted by address."""
+	with open(filename, 'w') as fp:
+		for name, address in sorted(symbols.items(), key=lambda symbol: (symbol[1], symbol[0])):
+			print(f'{address:04x} {name}', file=fp)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+#Round-trip verification of the assembler against the disassembler.
+#Instructions are disassembled, the disassembly is reassembled, and the two encodings are compared.
+#Throughput of both directions is measured along the way, so this doubles as a performance regression suite.
+#Disagreements that are understood are listed in knownfailures.json, so that only new ones fail a run.
+
+import json
+import os
+import random
+import sys
+import time
+
+import msprobe
+from assemble import AssemblyError, encodeInstruction, hexrep, swapEndianness
+
+extensionWords = [0x1234, 0x5678] #Extension words following each encoding in the exhaustive run
+sameExtensionWords = [0x1234, 0x1234] #And again for encodings with two, so that source and destination indexes match
+statuses = ['ok', 'equivalent', 'mismatch', 'asm error', 'disasm error', 'known failure']
+"""
+Outcomes of a round trip:
+* `ok`: reassembly gave back the original words
+* `equivalent`: reassembly gave different words of the same length, which disassemble to the same text
+  (e.g. a non-canonical encoding)
+* `mismatch`: reassembly gave words which disassemble to different text
+* `asm error`: the assembler rejected the disassembly
+* `disasm error`: the disassembler failed on the original words
+* `known failure`: one of the above failures, listed in the known failures file
+"""
+failureStatuses = ['mismatch', 'asm error', 'disasm error']
+defaultKnownFailures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knownfailures.json')
+
+def roundTrip(words, disasm):
+	"""Reassembles the disassembly `disasm` of `words`, returning the outcome and the reassembled words."""
+	try:
+		reassembled = [swapEndianness(word) for word in encodeInstruction(disasm)[0]]
+	except (AssemblyError, ValueError, IndexError):
+		return 'asm error', []
+	if reassembled == words:
+		return 'ok', reassembled
+	if len(reassembled) != len(words): #Every later address would move
+		return 'mismatch', reassembled
+	try:
+		redisasm = msprobe.disassembleAt(reassembled + extensionWords, 0)[0]
+	except IndexError:
+		return 'mismatch', reassembled
+	return ('equivalent' if redisasm == disasm else 'mismatch'), reassembled
+
+def verifyExhaustive(results):
+	"""
+	Round trips the first word of every valid encoding, followed by fixed extension words.
+	Encodings with two extension words are round tripped a second time with equal ones.
+	"""
+	disasmTime = asmTime = 0
+	for instruction in range(0x10000):
+		if not msprobe.isValidInstruction(instruction):
+			continue
+		passes = [extensionWords, sameExtensionWords] if msprobe.instructionLength(instruction) == 3 else [extensionWords]
+		for extension in passes:
+			words = [instruction] + extension
+			start = time.perf_counter()
+			try:
+				disasm, length = msprobe.disassembleAt(words, 0)
+			except IndexError as exp:
+				results.append(('disasm error', words[:1], repr(exp), []))
+				continue
+			middle = time.perf_counter()
+			status, reassembled = roundTrip(words[:length], disasm)
+			asmTime += time.perf_counter() - middle
+			disasmTime += middle - start
+			results.append((status, words[:length], disasm, reassembled))
+	return disasmTime, asmTime
+
+def randomStream(count, rng):
+	"""Generates a stream of `count` random valid instructions, with random extension words."""
+	words = []
+	for i in range(count):
+		instruction = rng.randrange(0x10000)
+		while not msprobe.isValidInstruction(instruction):
+			instruction = rng.randrange(0x10000)
+		words.append(instruction)
+		words.extend(rng.randrange(0x10000) for i in range(msprobe.instructionLength(instruction) - 1))
+	return words
+
+def verifyStream(words, results):
+	"""Disassembles a stream of words in one go, then round trips each instruction in it."""
+	start = time.perf_counter()
+	output = msprobe.disassembleWords(words)
+	disasmTime = time.perf_counter() - start
+
+	start = time.perf_counter()
+	for index, (instruction, disasm) in output.items():
+		length = msprobe.instructionLength(instruction)
+		status, reassembled = roundTrip(words[index : index + length], disasm)
+		results.append((status, words[index : index + length], disasm, reassembled))
+	return disasmTime, time.perf_counter() - start
+
+def readKnownFailures(filename):
+	"""
+	Reads a JSON list of known failures, each with the status it fails with and a mask and value (in hex) that
+	its first word matches, along with the reason for it. Returns a list of (status, mask, value).
+	"""
+	with open(filename) as fp:
+		return [(known['status'], int(known['mask'], 16), int(known['value'], 16)) for known in json.load(fp)]
+
+def isKnownFailure(knownFailures, status, words):
+	return any(status == knownStatus and words[0] & mask == value for knownStatus, mask, value in knownFailures)
+
+def benchmarkAliases(repeat=3):
+	"""
+	Times disassembly of every valid two-operand encoding with and without rendering of emulated instructions,
+	returning the best of `repeat` runs in instructions/sec for each.
+	"""
+	encodings = [[instruction] + extensionWords for instruction in range(0x4000, 0x10000)]
+	rates = {}
+	for aliases in (True, False):
+		best = None
+		for i in range(repeat):
+			start = time.perf_counter()
+			for words in encodings:
+				msprobe.disassembleAt(words, 0, aliases)
+			elapsed = time.perf_counter() - start
+			best = elapsed if best is None else min(best, elapsed)
+		rates['aliases on' if aliases else 'aliases off'] = len(encodings) / best
+	return rates
+
+def verifyMain(exhaustive=True, count=10000, seed=0, baseline=None, saveBaseline=False, tolerance=0.2, outfile=None, silent=False,
+	aliasBenchmark=False, knownFailures=defaultKnownFailures):
+	"""
+	Runs the round trip verification, reports failures and throughput, and returns an exit code.
+	The run fails on failures not listed in the `knownFailures` file, or on a performance regression against `baseline`.
+	"""
+	if aliasBenchmark:
+		for name, rate in benchmarkAliases().items():
+			print(f'two-op disassembly, {name}: {rate:.0f} instructions/sec')
+		return 0
+
+	results = []
+	disasmTime = asmTime = 0
+	if exhaustive:
+		disasmTime, asmTime = verifyExhaustive(results)
+	if count:
+		streamDisasmTime, streamAsmTime = verifyStream(randomStream(count, random.Random(seed)), results)
+		disasmTime += streamDisasmTime
+		asmTime += streamAsmTime
+
+	outFP = open(outfile, 'w') if outfile else None
+	def report(line):
+		if outFP:
+			print(line, file=outFP)
+		if not silent:
+			print(line, file=sys.stdout)
+
+	known = readKnownFailures(knownFailures) if knownFailures else []
+	for position, (status, words, disasm, reassembled) in enumerate(results):
+		if status in failureStatuses and isKnownFailure(known, status, words):
+			results[position] = ('known failure', words, disasm, reassembled)
+
+	#List every new failure, grouped by mnemonic so that a single bug doesn't drown out the rest
+	failures = {}
+	for status, words, disasm, reassembled in results:
+		if status in failureStatuses:
+			failures.setdefault((status, disasm.split(' ')[0]), []).append((words, disasm, reassembled))
+	for (status, mnemonic), cases in sorted(failures.items()):
+		report(f'{status}: {mnemonic} ({len(cases)} cases)')
+		for words, disasm, reassembled in cases[:3]:
+			original = ' '.join(hexrep(word) for word in words)
+			report(f'\t{original}: {disasm} -> ' + (' '.join(hexrep(word) for word in reassembled) or '(none)'))
+
+	counts = {status: 0 for status in statuses}
+	for result in results:
+		counts[result[0]] += 1
+	report(', '.join(f'{counts[status]} {status}' for status in statuses))
+
+	rates = {
+		'disassembly': len(results) / disasmTime if disasmTime else 0,
+		'assembly': len(results) / asmTime if asmTime else 0,
+	}
+	for direction, rate in rates.items():
+		report(f'{direction}: {rate:.0f} instructions/sec')
+
+	exitCode = 1 if any(counts[status] for status in failureStatuses) else 0
+	if baseline and saveBaseline:
+		with open(baseline, 'w') as fp:
+			json.dump(rates, fp, indent='\t')
+	elif baseline:
+		with open(baseline) as fp:
+			baselineRates = json.load(fp)
+		for direction, rate in rates.items():
+			if rate < baselineRates[direction] * (1 - tolerance):
+				report(f'Performance regression: {direction} is {1 - rate / baselineRates[direction]:.0%} slower than the baseline')
+				exitCode = 1
+
+	if outFP:
+		outFP.close()
+	return exitCode